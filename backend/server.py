@@ -1,5 +1,7 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, Request, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
+from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -7,12 +9,33 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Any, Hashable, Literal, Union
+from collections import OrderedDict
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
+import asyncio
+import copy
+import time
+import numpy as np
 import hashlib
+import hmac
+import math
+import json
+import base64
+import csv
+import io
+import zlib
+import smtplib
+from email.message import EmailMessage
+from string import Template
 import secrets
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import textwrap
+import tempfile
+from pymongo import ReturnDocument, ReplaceOne, DeleteOne, UpdateOne, CursorType
+from pymongo.errors import DuplicateKeyError, OperationFailure, CollectionInvalid
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -39,26 +62,14 @@ api_router = APIRouter(prefix="/api")
 # JWT Configuration
 JWT_SECRET = os.environ.get("JWT_SECRET", "supersecretkey")
 JWT_ALGORITHM = "HS256"
-JWT_EXP_HOURS = 24
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+REVOCATION_SYNC_SECONDS = float(os.environ.get("REVOCATION_SYNC_SECONDS", "5"))
 
 security = HTTPBearer()
-def create_jwt_token(data: dict):
-    expire = datetime.utcnow() + timedelta(hours=JWT_EXP_HOURS)
-    payload = data.copy()
-    payload.update({"exp": expire})
-    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
-    return token
-
-def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token expired")
-    except jwt.InvalidTokenError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-JWT_EXPIRATION_HOURS = 24
+optional_security = HTTPBearer(auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+guest_session_header = APIKeyHeader(name="X-Guest-Session", auto_error=False)
     
 # Enhanced Models
 class Product(BaseModel):
@@ -82,6 +93,8 @@ class Product(BaseModel):
     is_restricted: bool = False
     weight: Optional[str] = None
     dimensions: Optional[str] = None
+    sku: Optional[str] = None
+    dealer_price: Optional[float] = None  # Only populated for authenticated dealers
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ProductCreate(BaseModel):
@@ -104,6 +117,23 @@ class ProductCreate(BaseModel):
     is_restricted: bool = False
     weight: Optional[str] = None
     dimensions: Optional[str] = None
+    sku: Optional[str] = None
+
+# Product Review Models
+class Review(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    product_id: str
+    user_id: str
+    user_name: str
+    rating: int = Field(ge=1, le=5)
+    title: Optional[str] = None
+    comment: str
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class ReviewCreate(BaseModel):
+    rating: int = Field(ge=1, le=5)
+    title: Optional[str] = None
+    comment: str
 
 class Category(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -168,6 +198,7 @@ class UserCreate(BaseModel):
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
+    guest_session: Optional[str] = None  # Guest cart to merge into the user's cart
 
 class UserResponse(BaseModel):
     id: str
@@ -191,6 +222,7 @@ class Dealer(BaseModel):
     phone: str
     address: str
     license_number: str
+    pricing_tier: str = "standard"
     is_approved: bool = False
     is_active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -216,15 +248,89 @@ class DealerResponse(BaseModel):
     phone: str
     address: str
     license_number: str
+    pricing_tier: str = "standard"
     is_approved: bool
     is_active: bool
 
+# Dealer API Key Models
+API_KEY_SCOPES = ["catalog:read", "pricing:read"]
+
+class ApiKeyCreate(BaseModel):
+    name: str
+    scopes: List[str] = API_KEY_SCOPES
+
+class ApiKeyResponse(BaseModel):
+    id: str
+    name: str
+    prefix: str
+    scopes: List[str]
+    revoked: bool
+    created_at: datetime
+
+# Dealer Pricing Models
+RETAIL_TIER = "retail"  # Tier applied to regular users and anonymous visitors
+
+class PricingTier(BaseModel):
+    name: str
+    discount_percent: float = Field(ge=0, le=100)
+
+class VolumeBreak(BaseModel):
+    min_quantity: int = Field(ge=1)
+    discount_percent: float = Field(ge=0, le=100)
+    tiers: Optional[List[str]] = None  # None applies the break to every tier
+
+class BrandOverride(BaseModel):
+    tier: str
+    brand: str
+    discount_percent: float = Field(ge=0, le=100)
+
+class PricingRules(BaseModel):
+    tiers: List[PricingTier]
+    volume_breaks: List[VolumeBreak] = []
+    brand_overrides: List[BrandOverride] = []
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class DealerTierUpdate(BaseModel):
+    pricing_tier: str
+
+DEFAULT_PRICING_RULES = PricingRules(
+    tiers=[
+        PricingTier(name=RETAIL_TIER, discount_percent=0),
+        PricingTier(name="standard", discount_percent=10),
+        PricingTier(name="preferred", discount_percent=15),
+        PricingTier(name="elite", discount_percent=20)
+    ],
+    volume_breaks=[VolumeBreak(min_quantity=15, discount_percent=12, tiers=["standard", "preferred", "elite"])]
+)
+
 # Quote System Models
 class QuoteItem(BaseModel):
     product_id: str
     quantity: int
     price: float
     notes: Optional[str] = None
+    # Product snapshot taken when the quote is submitted
+    name: Optional[str] = None
+    brand: Optional[str] = None
+    image_url: Optional[str] = None
+    sku: Optional[str] = None
+
+QUOTE_SNAPSHOT_FIELDS = ("name", "brand", "image_url", "sku")
+QUOTE_SNAPSHOT_PROJECTION = {"_id": 0, "id": 1, **{field: 1 for field in QUOTE_SNAPSHOT_FIELDS}}
+
+class QuoteCustomer(BaseModel):
+    """The submitting user as of submission, kept on the quote for search"""
+    name: str
+    email: str
+    company_name: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user: dict) -> "QuoteCustomer":
+        return cls(
+            name=f"{user['first_name']} {user['last_name']}",
+            email=user["email"],
+            company_name=user.get("company_name")
+        )
 
 class Quote(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -244,6 +350,8 @@ class Quote(BaseModel):
     
     status: str = "pending"  # pending, reviewed, approved, declined
     admin_notes: Optional[str] = None
+    customer: Optional[QuoteCustomer] = None
+    version: int = 0  # bumped by every admin write, for compare-and-set
     
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -277,6 +385,26 @@ class QuoteResponse(BaseModel):
     additional_requirements: Optional[str]
     status: str
     admin_notes: Optional[str]
+    version: int = 0
+    created_at: datetime
+    updated_at: datetime
+
+class QuotePricingUpdate(BaseModel):
+    # Prices keyed by product_id; a plain list is the older by-position form
+    item_prices: Optional[Union[Dict[str, float], List[float]]] = None
+    # Optional check: rejected unless it matches the total computed from the item prices
+    total_amount: Optional[float] = None
+    admin_notes: str = ""
+    # When set, the update only applies if the quote is still at this version
+    version: Optional[int] = None
+
+class QuoteSummary(BaseModel):
+    id: str
+    project_name: str
+    intended_use: str
+    status: str
+    item_count: int
+    total_amount: float = 0.0
     created_at: datetime
     updated_at: datetime
 
@@ -307,14 +435,14 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
             detail="Invalid or expired admin token"
         )
     
-    admin = await db.admins.find_one({"id": token_data["user_id"], "is_active": True})
+    admin = await resolve_principal("admin", token_data["user_id"])
     if not admin:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Admin not found or inactive"
         )
     
-    return Admin(**admin)
+    return admin
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -343,36 +471,440 @@ class Cart(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class CartProduct(BaseModel):
+    """The subset of a product the cart views render"""
+    id: str
+    name: str
+    brand: str
+    image_url: str
+    price: float
+    in_stock: bool
+    stock_quantity: int
+    is_restricted: bool = False
+
+CART_PRODUCT_PROJECTION = {"_id": 0, **{field: 1 for field in CartProduct.model_fields}}
+
 class AddToCartRequest(BaseModel):
     product_id: str
-    quantity: int = 1
+    quantity: int = Field(default=1, ge=1)
+
+class CartBatchRequest(BaseModel):
+    items: List[AddToCartRequest] = Field(min_length=1, max_length=500)
+
+class CartItemUpdate(BaseModel):
+    quantity: int = Field(ge=0)  # 0 removes the line
+
+# Token Refresh Models
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+# In-memory caching
+class TTLCache:
+    """Bounded LRU cache whose entries expire after a TTL, with hit/miss counters.
+
+    Entries are evicted least-recently-used first once ``maxsize`` is reached.
+    The cache is per process; the TTL bounds how stale other workers can be.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+# Authenticated principals keyed by (user_type, user_id)
+principal_cache = TTLCache(
+    maxsize=int(os.environ.get("PRINCIPAL_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+)
+
+PRINCIPAL_SOURCES = {
+    "user": ("users", User),
+    "dealer": ("dealers", Dealer),
+    "admin": ("admins", Admin)
+}
+
+async def resolve_principal(user_type: str, user_id: str):
+    """Load an active user, dealer or admin, served from principal_cache when possible"""
+    key = (user_type, user_id)
+    principal = principal_cache.get(key)
+    if principal is not None:
+        return principal
+    
+    collection, model = PRINCIPAL_SOURCES[user_type]
+    doc = await db[collection].find_one({"id": user_id, "is_active": True}, {"_id": 0, "password": 0})
+    if not doc:
+        return None
+    
+    principal = model(**doc)
+    principal_cache.set(key, principal)
+    return principal
+
+def invalidate_principal(user_type: str, user_id: str):
+    """Drop a cached principal after its account is edited, deactivated or rejected"""
+    principal_cache.invalidate((user_type, user_id))
+
+# Login rate limiting
+class TokenBucketLimiter:
+    """Per-key token buckets held in memory, bounded to the ``max_keys`` most recent keys"""
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 100000):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()
+
+    def consume(self, key: Hashable, cost: float = 1) -> float:
+        """Take ``cost`` tokens; returns 0 if allowed, otherwise seconds until it would be"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - updated) * self.refill_per_second)
+        if tokens >= cost:
+            tokens -= cost
+            retry_after = 0.0
+        else:
+            retry_after = (cost - tokens) / self.refill_per_second
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+login_ip_limiter = TokenBucketLimiter(
+    capacity=float(os.environ.get("LOGIN_IP_BURST", "20")),
+    refill_per_second=float(os.environ.get("LOGIN_IP_PER_MINUTE", "10")) / 60
+)
+login_account_limiter = TokenBucketLimiter(
+    capacity=float(os.environ.get("LOGIN_ACCOUNT_BURST", "5")),
+    refill_per_second=float(os.environ.get("LOGIN_ACCOUNT_PER_MINUTE", "1")) / 60
+)
+
+# Optional limit on failed logins per account shared across workers through Mongo
+LOGIN_RATE_LIMIT_BACKEND = os.environ.get("LOGIN_RATE_LIMIT_BACKEND", "memory")  # "memory" or "mongo"
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.environ.get("LOGIN_FAILURE_WINDOW_SECONDS", "900"))
+LOGIN_FAILURE_LIMIT = int(os.environ.get("LOGIN_FAILURE_LIMIT", "10"))
+# Set TRUST_PROXY_HEADERS=true when running behind the ingress/load balancer. Left
+# false there, every request carries the proxy's address, so all clients share a
+# single IP bucket: LOGIN_IP_BURST (20) attempts, refilling LOGIN_IP_PER_MINUTE
+# (10/min), for the whole site. Only enable it when the proxy overwrites
+# X-Forwarded-For, otherwise clients can pick their own bucket.
+TRUST_PROXY_HEADERS = os.environ.get("TRUST_PROXY_HEADERS", "false").lower() == "true"
+
+# Accounts found blocked by the shared window; later attempts are rejected from memory
+blocked_login_accounts = TTLCache(maxsize=100000, ttl=LOGIN_FAILURE_WINDOW_SECONDS)
+
+def client_ip(request: Request) -> str:
+    if TRUST_PROXY_HEADERS:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def _too_many_attempts(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts. Please try again later.",
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+async def enforce_login_rate_limit(request: Request, user_type: str, identifier: str):
+    """Reject a login attempt before any database work if its IP or account is over limit"""
+    retry_after = login_ip_limiter.consume(client_ip(request))
+    if retry_after:
+        raise _too_many_attempts(retry_after)
+    
+    account_key = f"{user_type}:{identifier.lower()}"
+    retry_after = login_account_limiter.consume(account_key)
+    if retry_after:
+        raise _too_many_attempts(retry_after)
+    
+    if blocked_login_accounts.get(account_key):
+        raise _too_many_attempts(LOGIN_FAILURE_WINDOW_SECONDS)
+    
+    if LOGIN_RATE_LIMIT_BACKEND == "mongo":
+        window_start = datetime.now(timezone.utc) - timedelta(seconds=LOGIN_FAILURE_WINDOW_SECONDS)
+        failures = await db.login_failures.count_documents(
+            {"key": account_key, "created_at": {"$gt": window_start}},
+            limit=LOGIN_FAILURE_LIMIT
+        )
+        if failures >= LOGIN_FAILURE_LIMIT:
+            blocked_login_accounts.set(account_key, True)
+            raise _too_many_attempts(LOGIN_FAILURE_WINDOW_SECONDS)
+
+async def record_login_failure(user_type: str, identifier: str):
+    if LOGIN_RATE_LIMIT_BACKEND == "mongo":
+        await db.login_failures.insert_one({
+            "key": f"{user_type}:{identifier.lower()}",
+            "created_at": datetime.now(timezone.utc)
+        })
 
 # Utility functions
+# Password hashing: scrypt, stored as "scrypt$n$r$p$salt$hash" (hex). Bare SHA-256
+# hex digests from older accounts still verify and are upgraded on the next login.
+SCRYPT_N = int(os.environ.get("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+
+# hashlib.scrypt releases the GIL, so a thread pool keeps the event loop free
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", "4"))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_slots: Optional[asyncio.Semaphore] = None
+
 def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=SCRYPT_DKLEN)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${digest.hex()}"
 
 def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+    if not hashed.startswith("scrypt$"):
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, hashed)
+    try:
+        _, n, r, p, salt, expected = hashed.split("$")
+        digest = hashlib.scrypt(password.encode(), salt=bytes.fromhex(salt), n=int(n), r=int(r), p=int(p), dklen=len(expected) // 2)
+    except ValueError:
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+def password_needs_rehash(hashed: str) -> bool:
+    return not hashed.startswith(f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}$")
+
+async def _run_password_job(func, *args):
+    # The semaphore caps queued KDF work so a login storm cannot pile up unbounded jobs
+    global _password_slots
+    if _password_slots is None:
+        _password_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS * 2)
+    async with _password_slots:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await _run_password_job(verify_password, password, hashed)
+
+# Unknown accounts are checked against this so a miss costs the same scrypt run as a hit
+DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16))
+
+async def verify_login_password(password: str, account: Optional[dict]) -> bool:
+    """Check a login password, spending the same hashing work whether or not the account exists"""
+    valid = await verify_password_async(password, account["password"] if account else DUMMY_PASSWORD_HASH)
+    return valid and account is not None
+
+async def rehash_password_if_needed(collection: str, account: dict, password: str):
+    """Transparently upgrade a legacy or outdated hash after a successful login"""
+    if password_needs_rehash(account["password"]):
+        new_hash = await hash_password_async(password)
+        await db[collection].update_one(
+            {"id": account["id"], "password": account["password"]},
+            {"$set": {"password": new_hash}}
+        )
 
 def create_jwt_token(user_id: str, user_type: str = "user") -> str:
+    now = datetime.now(timezone.utc)
     payload = {
         "user_id": user_id,
         "user_type": user_type,
-        "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
+        "jti": uuid.uuid4().hex,
+        "iat": now,
+        "exp": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def verify_jwt_token(token: str) -> Optional[Dict]:
+def decode_jwt_token(token: str) -> Optional[Dict]:
+    """Verify the signature and expiry of a token and extract its claims"""
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return {
-            "user_id": payload.get("user_id"),
-            "user_type": payload.get("user_type", "user")
-        }
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
+    
+    return {
+        "user_id": payload.get("user_id"),
+        "user_type": payload.get("user_type", "user"),
+        "jti": payload.get("jti"),
+        "iat": payload.get("iat", 0),
+        "exp": payload.get("exp", 0)
+    }
+
+# Decoded claims of recently verified tokens, keyed by a SHA-256 digest of the token
+token_cache = TTLCache(
+    maxsize=int(os.environ.get("TOKEN_CACHE_SIZE", "10000")),
+    ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60
+)
+
+def verify_jwt_token(token: str) -> Optional[Dict]:
+    digest = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(digest)
+    if token_data is None:
+        token_data = decode_jwt_token(token)
+        if token_data is None:
+            return None
+        # Keep the claims only until the token itself expires
+        token_cache.set(digest, token_data, ttl=token_data["exp"] - time.time())
+    elif token_data["exp"] <= time.time():
+        token_cache.invalidate(digest)
+        return None
+    
+    if revocation_filter.is_revoked(token_data):
+        return None
+    return token_data
+
+def _utc_timestamp(value: datetime) -> float:
+    # Motor hands back naive datetimes that are already in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class RevocationFilter:
+    """In-memory view of the revoked_tokens collection.
+
+    Holds revoked access-token ids and per-account cutoffs ("every token issued
+    before T is revoked"). Request handling only consults memory; a background
+    task pulls new revocations every REVOCATION_SYNC_SECONDS so revocations made
+    by other workers take effect within seconds. Entries are dropped once the
+    access tokens they cover have expired.
+    """
+
+    def __init__(self):
+        self.revoked_jtis: Dict[str, float] = {}
+        self.subject_cutoffs: Dict[tuple, float] = {}
+        self._subject_expiry: Dict[tuple, float] = {}
+        self.last_synced: Optional[datetime] = None
+
+    def is_revoked(self, token_data: Dict) -> bool:
+        if token_data.get("jti") in self.revoked_jtis:
+            return True
+        cutoff = self.subject_cutoffs.get((token_data["user_type"], token_data["user_id"]))
+        return cutoff is not None and token_data.get("iat", 0) < cutoff
+
+    def add(self, doc: dict):
+        expires_at = _utc_timestamp(doc["expires_at"])
+        if doc["kind"] == "token":
+            self.revoked_jtis[doc["jti"]] = expires_at
+        else:
+            subject = (doc["user_type"], doc["user_id"])
+            cutoff = _utc_timestamp(doc["revoked_before"])
+            self.subject_cutoffs[subject] = max(cutoff, self.subject_cutoffs.get(subject, 0))
+            self._subject_expiry[subject] = max(expires_at, self._subject_expiry.get(subject, 0))
+
+    def prune(self):
+        now = time.time()
+        self.revoked_jtis = {jti: exp for jti, exp in self.revoked_jtis.items() if exp > now}
+        for subject, exp in list(self._subject_expiry.items()):
+            if exp <= now:
+                del self._subject_expiry[subject]
+                self.subject_cutoffs.pop(subject, None)
+
+    async def sync(self):
+        now = datetime.now(timezone.utc)
+        query = {"expires_at": {"$gt": now}}
+        if self.last_synced is not None:
+            # Overlap the previous window a little; adding an entry twice is harmless
+            query["created_at"] = {"$gte": self.last_synced - timedelta(seconds=REVOCATION_SYNC_SECONDS)}
+        async for doc in db.revoked_tokens.find(query, {"_id": 0}):
+            self.add(doc)
+        self.last_synced = now
+        self.prune()
+
+revocation_filter = RevocationFilter()
+
+async def revoke_access_token(jti: str, exp: float):
+    doc = {
+        "kind": "token",
+        "jti": jti,
+        "created_at": datetime.now(timezone.utc),
+        "expires_at": datetime.fromtimestamp(exp, timezone.utc)
+    }
+    revocation_filter.add(doc)
+    await db.revoked_tokens.insert_one(doc)
+
+async def revoke_subject_tokens(user_type: str, user_id: str):
+    """Revoke every access and refresh token issued to an account so far"""
+    now = datetime.now(timezone.utc)
+    doc = {
+        "kind": "subject",
+        "user_type": user_type,
+        "user_id": user_id,
+        "revoked_before": now,
+        "created_at": now,
+        "expires_at": now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    }
+    revocation_filter.add(doc)
+    await db.revoked_tokens.insert_one(doc)
+    await db.refresh_tokens.update_many(
+        {"user_type": user_type, "user_id": user_id, "revoked": False},
+        {"$set": {"revoked": True}}
+    )
+
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_token_pair(user_id: str, user_type: str, family_id: Optional[str] = None) -> Dict:
+    """Create an access token plus a rotating refresh token stored (hashed) in Mongo"""
+    refresh_token = secrets.token_urlsafe(32)
+    now = datetime.now(timezone.utc)
+    await db.refresh_tokens.insert_one({
+        "id": str(uuid.uuid4()),
+        "token_hash": _hash_refresh_token(refresh_token),
+        "family_id": family_id or str(uuid.uuid4()),
+        "user_id": user_id,
+        "user_type": user_type,
+        "revoked": False,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    })
+    return {
+        "access_token": create_jwt_token(user_id, user_type),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+async def revocation_sync_loop():
+    while True:
+        try:
+            await revocation_filter.sync()
+        except Exception:
+            logger.exception("Failed to sync revoked tokens")
+        await asyncio.sleep(REVOCATION_SYNC_SECONDS)
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     token_data = verify_jwt_token(credentials.credentials)
@@ -382,14 +914,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid or expired token"
         )
     
-    user = await db.users.find_one({"id": token_data["user_id"], "is_active": True})
+    user = await resolve_principal("user", token_data["user_id"])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive"
         )
     
-    return User(**user)
+    return user
 
 async def get_current_dealer(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dealer:
     token_data = verify_jwt_token(credentials.credentials)
@@ -399,20 +931,218 @@ async def get_current_dealer(credentials: HTTPAuthorizationCredentials = Depends
             detail="Invalid or expired token"
         )
     
-    dealer = await db.dealers.find_one({"id": token_data["user_id"], "is_active": True})
+    dealer = await resolve_principal("dealer", token_data["user_id"])
     if not dealer:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Dealer not found or inactive"
         )
     
-    return Dealer(**dealer)
+    return dealer
+
+# Dealer API keys: stored as SHA-256 hashes, resolved through an in-memory cache
+api_key_cache = TTLCache(
+    maxsize=int(os.environ.get("API_KEY_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("API_KEY_CACHE_TTL_SECONDS", "60"))
+)
+
+def _hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+async def lookup_api_key(api_key: str) -> dict:
+    """The active key document for ``api_key``, or an empty dict"""
+    key_hash = _hash_api_key(api_key)
+    key_doc = api_key_cache.get(key_hash)
+    if key_doc is None:
+        key_doc = await db.api_keys.find_one(
+            {"key_hash": key_hash, "revoked": False},
+            {"_id": 0, "id": 1, "dealer_id": 1, "scopes": 1}
+        )
+        # Unknown keys are cached too, so a misconfigured integration cannot hammer Mongo
+        key_doc = key_doc or {}
+        api_key_cache.set(key_hash, key_doc)
+    return key_doc
+
+async def resolve_api_key(api_key: str, scope: str) -> Optional[Dealer]:
+    """Dealer owning an active API key that grants ``scope``, or None"""
+    key_doc = await lookup_api_key(api_key)
+    if not key_doc or scope not in key_doc["scopes"]:
+        return None
+    return await resolve_principal("dealer", key_doc["dealer_id"])
+
+def dealer_with_scope(scope: str):
+    """Dependency accepting a dealer bearer token or an X-API-Key granting ``scope``"""
+    async def dependency(
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+        api_key: Optional[str] = Depends(api_key_header)
+    ) -> Dealer:
+        if api_key:
+            dealer = await resolve_api_key(api_key, scope)
+            if not dealer:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid API key or missing scope"
+                )
+            return dealer
+        if not credentials:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Not authenticated"
+            )
+        return await get_current_dealer(credentials)
+    return dependency
+
+async def get_optional_dealer(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    api_key: Optional[str] = Depends(api_key_header)
+) -> Optional[Dealer]:
+    """Resolve the dealer behind a bearer token or API key, or None for anonymous and non-dealer callers.
+
+    An API key must grant catalog:read, and only carries dealer pricing if it also
+    grants pricing:read. Bad keys get a 401 rather than silently seeing list prices.
+    """
+    if api_key:
+        dealer = await resolve_api_key(api_key, "catalog:read")
+        if not dealer:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key or missing scope"
+            )
+        key_doc = await lookup_api_key(api_key)
+        return dealer if "pricing:read" in key_doc.get("scopes", []) else None
+    if not credentials:
+        return None
+    token_data = verify_jwt_token(credentials.credentials)
+    if not token_data or token_data["user_type"] != "dealer":
+        return None
+    
+    return await resolve_principal("dealer", token_data["user_id"])
+
+# Dealer Pricing Engine
+PRICING_REFRESH_SECONDS = int(os.environ.get("PRICING_REFRESH_SECONDS", "60"))
+
+class PricingEngine:
+    """Per-tier price vectors for the whole catalog, precomputed with NumPy.
+
+    Rebuilt when pricing rules or product prices change, and every
+    PRICING_REFRESH_SECONDS by ``pricing_refresh_loop`` so changes made by other
+    workers are picked up without a request waiting on the rebuild. Pricing a
+    list of products is then an index lookup into ``tier_prices`` plus a
+    ``searchsorted`` over the volume breaks.
+    """
+
+    def __init__(self):
+        self.tier_index: Dict[str, int] = {}
+        self.product_index: Dict[str, int] = {}
+        self.tier_prices = np.zeros((0, 0))
+        self.break_quantities = np.array([0])
+        self.break_factors = np.ones((0, 1))
+        self.built_at = 0.0
+        self.stale = True
+        self._lock = asyncio.Lock()
+
+    def mark_stale(self):
+        self.stale = True
+
+    async def ensure_fresh(self):
+        """Rebuild only after a local change; periodic refreshes happen in the background"""
+        if not self.stale:
+            return
+        async with self._lock:
+            if self.stale:
+                await self.rebuild()
+
+    async def rebuild(self):
+        rules_doc = await db.pricing_rules.find_one({"id": "default"}, {"_id": 0, "id": 0})
+        rules = PricingRules(**rules_doc) if rules_doc else DEFAULT_PRICING_RULES
+        products = await db.products.find({}, {"_id": 0, "id": 1, "price": 1, "brand": 1}).to_list(length=None)
+        self.build(rules, products)
+
+    def build(self, rules: PricingRules, products: List[dict]):
+        tier_index = {tier.name: i for i, tier in enumerate(rules.tiers)}
+        product_index = {product["id"]: i for i, product in enumerate(products)}
+        base_prices = np.array([product["price"] for product in products], dtype=float)
+        brands = np.array([product.get("brand", "") for product in products], dtype=object)
+
+        # discounts[t, p] is the percentage off list price for tier t on product p
+        discounts = np.repeat(
+            np.array([[tier.discount_percent] for tier in rules.tiers], dtype=float),
+            len(products),
+            axis=1
+        )
+        for override in rules.brand_overrides:
+            if override.tier in tier_index:
+                discounts[tier_index[override.tier], brands == override.brand] = override.discount_percent
+
+        # break_factors[t, k] is the multiplier for tier t once quantity reaches
+        # break_quantities[k]; breaks scoped to other tiers carry the previous factor
+        volume_breaks = sorted(rules.volume_breaks, key=lambda vb: vb.min_quantity)
+        break_factors = np.ones((len(rules.tiers), len(volume_breaks) + 1))
+        for k, volume_break in enumerate(volume_breaks, start=1):
+            break_factors[:, k] = break_factors[:, k - 1]
+            for tier in rules.tiers:
+                if volume_break.tiers is None or tier.name in volume_break.tiers:
+                    break_factors[tier_index[tier.name], k] = 1 - volume_break.discount_percent / 100
+        
+        self.tier_index = tier_index
+        self.product_index = product_index
+        self.tier_prices = base_prices[np.newaxis, :] * (1 - discounts / 100)
+        self.break_quantities = np.array([0] + [vb.min_quantity for vb in volume_breaks])
+        self.break_factors = break_factors
+        self.built_at = time.monotonic()
+        self.stale = False
+
+    def price(self, tier: str, product_ids: List[str], quantities: Optional[List[int]] = None) -> np.ndarray:
+        """Unit prices for ``product_ids`` at ``tier``; NaN for products not in the catalog"""
+        cols = np.fromiter((self.product_index.get(pid, -1) for pid in product_ids), dtype=np.intp, count=len(product_ids))
+        if not self.product_index or not self.tier_index:
+            return np.full(len(cols), np.nan)
+        tier_row = self._tier_row(tier)
+        prices = np.where(cols >= 0, self.tier_prices[tier_row][cols], np.nan)
+        if quantities is not None:
+            steps = np.searchsorted(self.break_quantities, np.asarray(quantities), side="right") - 1
+            prices = prices * self.break_factors[tier_row][steps]
+        return np.round(prices, 2)
+
+    def volume_breaks(self, tier: str) -> List[dict]:
+        """The volume breaks that change the price for ``tier``"""
+        if not self.tier_index:
+            return []
+        factors = self.break_factors[self._tier_row(tier)]
+        return [
+            {"min_quantity": int(self.break_quantities[k]), "discount_percent": round(float(1 - factors[k]) * 100, 2)}
+            for k in range(1, len(factors))
+            if factors[k] != factors[k - 1]
+        ]
+
+    def _tier_row(self, tier: str) -> int:
+        return self.tier_index.get(tier, self.tier_index.get(RETAIL_TIER, 0))
+
+pricing_engine = PricingEngine()
+
+async def pricing_refresh_loop():
+    while True:
+        await asyncio.sleep(PRICING_REFRESH_SECONDS)
+        try:
+            await pricing_engine.rebuild()
+        except Exception:
+            logger.exception("Pricing refresh failed")
+
+async def apply_dealer_pricing(products: List[Product], dealer: Optional[Dealer]) -> List[Product]:
+    """Fill in dealer_price on a product listing for an authenticated dealer"""
+    if dealer and products:
+        await pricing_engine.ensure_fresh()
+        prices = pricing_engine.price(dealer.pricing_tier, [product.id for product in products])
+        for product, dealer_price in zip(products, prices):
+            product.dealer_price = None if np.isnan(dealer_price) else float(dealer_price)
+    return products
 
 # Initialize sample data
 @api_router.post("/initialize-data")
 async def initialize_sample_data():
     # Clear existing data
     await db.products.delete_many({})
+    await db.reviews.delete_many({})
     await db.categories.delete_many({})
     await db.brands.delete_many({})
     
@@ -649,7 +1379,9 @@ async def initialize_sample_data():
     
     for product in products:
         product_obj = Product(**product)
-        await db.products.insert_one(product_obj.dict())
+        await db.products.insert_one(product_obj.dict(exclude={"dealer_price"}))
+    
+    pricing_engine.mark_stale()
     
     return {"message": "Sample data initialized successfully"}
 
@@ -659,12 +1391,13 @@ async def create_sample_users():
     # Clear existing users and dealers
     await db.users.delete_many({})
     await db.dealers.delete_many({})
+    principal_cache.clear()
     
     # Create sample users
     sample_users = [
         {
             "email": "john.doe@company.com",
-            "password": hash_password("password123"),
+            "password": await hash_password_async("password123"),
             "first_name": "John",
             "last_name": "Doe",
             "company_name": "Tactical Solutions LLC",
@@ -678,7 +1411,7 @@ async def create_sample_users():
         },
         {
             "email": "sarah.wilson@defense.gov",
-            "password": hash_password("password123"),
+            "password": await hash_password_async("password123"),
             "first_name": "Sarah",
             "last_name": "Wilson",
             "company_name": "Defense Department",
@@ -692,7 +1425,7 @@ async def create_sample_users():
         },
         {
             "email": "mike.johnson@police.org",
-            "password": hash_password("password123"),
+            "password": await hash_password_async("password123"),
             "first_name": "Mike",
             "last_name": "Johnson",
             "company_name": "Metro Police Department",
@@ -717,7 +1450,7 @@ async def create_sample_users():
     sample_dealers = [
         {
             "email": "dealer@tactical-wholesale.com",
-            "password": hash_password("dealer123"),
+            "password": await hash_password_async("dealer123"),
             "company_name": "Tactical Wholesale Partners",
             "contact_name": "Robert Smith",
             "phone": "555-111-2222",
@@ -728,7 +1461,7 @@ async def create_sample_users():
         },
         {
             "email": "admin@tactical-supply.com", 
-            "password": hash_password("dealer123"),
+            "password": await hash_password_async("dealer123"),
             "company_name": "Tactical Supply Co",
             "contact_name": "Lisa Anderson",
             "phone": "555-333-4444",
@@ -746,17 +1479,31 @@ async def create_sample_users():
         dealer_with_password["password"] = dealer_data["password"]
         await db.dealers.insert_one(dealer_with_password)
     
-    # Create some sample quotes for demo
+    # Create some sample quotes for demo, quoting real catalog products
     users = await db.users.find().to_list(length=None)
-    if users:
+    products = await db.products.find({}, {**QUOTE_SNAPSHOT_PROJECTION, "price": 1}).limit(3).to_list(length=3)
+    
+    def sample_items(lines):
+        items = [
+            QuoteItem(
+                product_id=product["id"],
+                quantity=quantity,
+                price=product["price"],
+                **{field: product.get(field) for field in QUOTE_SNAPSHOT_FIELDS}
+            )
+            for product, quantity in lines
+        ]
+        return items, round(sum(item.price * item.quantity for item in items), 2)
+    
+    if users and len(products) == 3:
+        first_items, first_total = sample_items([(products[0], 2), (products[1], 1)])
+        second_items, second_total = sample_items([(products[2], 5)])
         sample_quotes = [
             {
                 "user_id": users[0]["id"],
-                "items": [
-                    {"product_id": "sample-1", "quantity": 2, "price": 299.99, "notes": "Tactical Plate Carrier Vest - 5.11 Tactical"},
-                    {"product_id": "sample-2", "quantity": 1, "price": 189.99, "notes": "Combat Tactical Boots - 5.11 Tactical"}
-                ],
-                "total_amount": 789.97,
+                "customer": QuoteCustomer.from_user(users[0]),
+                "items": first_items,
+                "total_amount": first_total,
                 "project_name": "Security Team Upgrade Q1",
                 "intended_use": "security_services",
                 "delivery_date": datetime.now(timezone.utc) + timedelta(days=30),
@@ -769,10 +1516,9 @@ async def create_sample_users():
             },
             {
                 "user_id": users[1]["id"] if len(users) > 1 else users[0]["id"],
-                "items": [
-                    {"product_id": "sample-3", "quantity": 5, "price": 449.99, "notes": "Red Dot Sight Optic - Ops-Core"}
-                ],
-                "total_amount": 2249.95,
+                "customer": QuoteCustomer.from_user(users[1] if len(users) > 1 else users[0]),
+                "items": second_items,
+                "total_amount": second_total,
                 "project_name": "Precision Equipment Procurement",
                 "intended_use": "military",
                 "delivery_date": datetime.now(timezone.utc) + timedelta(days=14),
@@ -789,6 +1535,7 @@ async def create_sample_users():
         for quote_data in sample_quotes:
             quote = Quote(**quote_data)
             await db.quotes.insert_one(quote.dict())
+            await apply_quote_rollup(None, quote.dict())
     
     # Create sample chat messages
     if users:
@@ -827,14 +1574,14 @@ async def create_sample_users():
     sample_admins = [
         {
             "email": "admin@oehtraders.com",
-            "password": hash_password("admin123"),
+            "password": await hash_password_async("admin123"),
             "username": "admin",
             "is_super_admin": True,
             "is_active": True
         },
         {
             "email": "support@oehtraders.com", 
-            "password": hash_password("support123"),
+            "password": await hash_password_async("support123"),
             "username": "support",
             "is_super_admin": False,
             "is_active": True
@@ -870,7 +1617,7 @@ async def register_user(user_data: UserCreate):
     
     # Create new user
     user_dict = user_data.dict()
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     user = User(**{k: v for k, v in user_dict.items() if k != "password"})
     
     # Store with password
@@ -882,9 +1629,12 @@ async def register_user(user_data: UserCreate):
     return {"message": "User registration successful"}
 
 @api_router.post("/users/login")
-async def login_user(login_data: UserLogin):
+async def login_user(login_data: UserLogin, request: Request, guest_session: Optional[str] = Depends(guest_session_header)):
+    await enforce_login_rate_limit(request, "user", login_data.email)
+    
     user = await db.users.find_one({"email": login_data.email})
-    if not user or not verify_password(login_data.password, user["password"]):
+    if not await verify_login_password(login_data.password, user):
+        await record_login_failure("user", login_data.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -896,10 +1646,16 @@ async def login_user(login_data: UserLogin):
             detail="User account is inactive"
         )
     
-    token = create_jwt_token(user["id"], "user")
+    await rehash_password_if_needed("users", user, login_data.password)
+    
+    # Carry over anything the visitor put in their cart before logging in
+    guest_owner = guest_cart_owner(login_data.guest_session or guest_session or "")
+    if guest_owner:
+        await cart_store.merge(guest_owner, user["id"])
+    
+    tokens = await issue_token_pair(user["id"], "user")
     return {
-        "access_token": token,
-        "token_type": "bearer",
+        **tokens,
         "user": UserResponse(**user)
     }
 
@@ -907,6 +1663,154 @@ async def login_user(login_data: UserLogin):
 async def get_user_profile(current_user: User = Depends(get_current_user)):
     return UserResponse(**current_user.dict())
 
+# Admin activity events. Write handlers publish to event_bus, which hands events
+# to every open /api/admin/events stream in this process. With EVENT_BUS=mongo
+# events go through a capped collection that every worker tails, so streams on
+# any worker see writes made on all of them.
+EVENT_BUS_BACKEND = os.environ.get("EVENT_BUS", "memory")  # "memory" or "mongo"
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", "15"))
+EVENT_LOG_BYTES = int(os.environ.get("EVENT_LOG_BYTES", str(16 * 1024 * 1024)))
+
+class MemoryEventBackend:
+    def __init__(self, deliver):
+        self._deliver = deliver
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(self, event: dict):
+        self._deliver(event)
+
+class MongoEventBackend:
+    """Fans events out across workers through the capped admin_events collection"""
+
+    def __init__(self, deliver):
+        self._deliver = deliver
+        self._tail_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        try:
+            await db.create_collection("admin_events", capped=True, size=EVENT_LOG_BYTES)
+        except CollectionInvalid:
+            pass  # already created by another worker
+        self._tail_task = asyncio.create_task(self._tail())
+
+    async def stop(self):
+        if self._tail_task:
+            self._tail_task.cancel()
+
+    async def publish(self, event: dict):
+        await db.admin_events.insert_one(dict(event))
+
+    async def _tail(self):
+        # Only events published after this worker started are delivered
+        newest = await db.admin_events.find({}, {"_id": 1}).sort("$natural", -1).limit(1).to_list(length=1)
+        last_id = newest[0]["_id"] if newest else None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            try:
+                cursor = db.admin_events.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+                while cursor.alive:
+                    async for event in cursor:
+                        last_id = event.pop("_id")
+                        self._deliver(event)
+            except Exception:
+                logger.exception("Admin event tail failed")
+            await asyncio.sleep(1)
+
+class EventBus:
+    def __init__(self, backend: str):
+        self._subscribers: set = set()
+        self.backend = MongoEventBackend(self._deliver) if backend == "mongo" else MemoryEventBackend(self._deliver)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def publish(self, event_type: str, data: dict):
+        """Publish an event; failures are logged so they never fail the write that caused them"""
+        event = {
+            "id": str(uuid.uuid4()),
+            "type": event_type,
+            "data": jsonable_encoder(data),
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        try:
+            await self.backend.publish(event)
+        except Exception:
+            logger.exception("Failed to publish %s event", event_type)
+
+    def _deliver(self, event: dict):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A stream that cannot keep up is closed; the client reconnects and reloads
+                self._subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": EVENT_BUS_BACKEND, "subscribers": len(self._subscribers)}
+
+event_bus = EventBus(EVENT_BUS_BACKEND)
+
+def _stream_token_valid(token_data: Dict) -> bool:
+    return token_data["exp"] > time.time() and not revocation_filter.is_revoked(token_data)
+
+async def admin_event_stream(token_data: Dict):
+    """SSE frames for one subscriber; the stream ends once the admin's token expires
+    or is revoked, and the client reconnects with a fresh token"""
+    # Subscribe only once the response starts iterating, so a client that disconnects
+    # before then never leaves a queue behind on the bus
+    queue = event_bus.subscribe()
+    try:
+        yield "retry: 5000\n\n"
+        while _stream_token_valid(token_data):
+            try:
+                # Wake no later than the token's expiry so the stream never outlives it
+                timeout = min(EVENT_HEARTBEAT_SECONDS, token_data["exp"] - time.time())
+                event = await asyncio.wait_for(queue.get(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                if _stream_token_valid(token_data):
+                    yield ": keep-alive\n\n"
+                continue
+            if event is None or not _stream_token_valid(token_data):
+                break
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        event_bus.unsubscribe(queue)
+
+@api_router.get("/admin/events")
+async def stream_admin_events(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    """Server-Sent Events feed of admin activity.
+
+    EventSource cannot send headers, so the admin token may be passed as ``?token=``.
+    The stream closes when that token expires or is revoked.
+    """
+    token_data = verify_jwt_token(token or (credentials.credentials if credentials else ""))
+    if not token_data or token_data["user_type"] != "admin" or not await resolve_principal("admin", token_data["user_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired admin token"
+        )
+    return StreamingResponse(
+        admin_event_stream(token_data),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Dealer Authentication Endpoints (existing)
 @api_router.post("/dealers/register")
 async def register_dealer(dealer_data: DealerCreate):
@@ -920,7 +1824,7 @@ async def register_dealer(dealer_data: DealerCreate):
     
     # Create new dealer
     dealer_dict = dealer_data.dict()
-    hashed_password = hash_password(dealer_data.password)
+    hashed_password = await hash_password_async(dealer_data.password)
     dealer = Dealer(**{k: v for k, v in dealer_dict.items() if k != "password"})
     
     # Store with password
@@ -928,13 +1832,23 @@ async def register_dealer(dealer_data: DealerCreate):
     dealer_with_password["password"] = hashed_password
     
     await db.dealers.insert_one(dealer_with_password)
+    await event_bus.publish("dealer.registered", {
+        "id": dealer.id,
+        "company_name": dealer.company_name,
+        "contact_name": dealer.contact_name,
+        "email": dealer.email,
+        "created_at": dealer.created_at
+    })
     
     return {"message": "Dealer registration successful. Awaiting approval."}
 
 @api_router.post("/dealers/login")
-async def login_dealer(login_data: DealerLogin):
+async def login_dealer(login_data: DealerLogin, request: Request):
+    await enforce_login_rate_limit(request, "dealer", login_data.email)
+    
     dealer = await db.dealers.find_one({"email": login_data.email})
-    if not dealer or not verify_password(login_data.password, dealer["password"]):
+    if not await verify_login_password(login_data.password, dealer):
+        await record_login_failure("dealer", login_data.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -952,10 +1866,11 @@ async def login_dealer(login_data: DealerLogin):
             detail="Dealer account is inactive"
         )
     
-    token = create_jwt_token(dealer["id"], "dealer")
+    await rehash_password_if_needed("dealers", dealer, login_data.password)
+    
+    tokens = await issue_token_pair(dealer["id"], "dealer")
     return {
-        "access_token": token,
-        "token_type": "bearer",
+        **tokens,
         "dealer": DealerResponse(**dealer)
     }
 
@@ -963,11 +1878,111 @@ async def login_dealer(login_data: DealerLogin):
 async def get_dealer_profile(current_dealer: Dealer = Depends(get_current_dealer)):
     return DealerResponse(**current_dealer.dict())
 
+@api_router.get("/dealers/price-list")
+async def get_dealer_price_list(current_dealer: Dealer = Depends(dealer_with_scope("pricing:read"))):
+    """Full catalog price list for the dealer's pricing tier"""
+    await pricing_engine.ensure_fresh()
+    product_ids = list(pricing_engine.product_index)
+    prices = pricing_engine.price(current_dealer.pricing_tier, product_ids)
+    return {
+        "pricing_tier": current_dealer.pricing_tier,
+        "volume_breaks": pricing_engine.volume_breaks(current_dealer.pricing_tier),
+        "prices": [
+            {"product_id": product_id, "dealer_price": float(price)}
+            for product_id, price in zip(product_ids, prices)
+        ]
+    }
+
+# Dealer API Key Endpoints
+@api_router.post("/dealers/api-keys")
+async def create_api_key(key_data: ApiKeyCreate, current_dealer: Dealer = Depends(get_current_dealer)):
+    """Create a scoped API key; the plaintext key is only returned once"""
+    unknown_scopes = set(key_data.scopes) - set(API_KEY_SCOPES)
+    if unknown_scopes:
+        raise HTTPException(status_code=400, detail=f"Unknown scopes: {', '.join(sorted(unknown_scopes))}")
+    
+    api_key = f"oeh_{secrets.token_urlsafe(32)}"
+    key_doc = {
+        "id": str(uuid.uuid4()),
+        "dealer_id": current_dealer.id,
+        "name": key_data.name,
+        "prefix": api_key[:12],
+        "key_hash": _hash_api_key(api_key),
+        "scopes": key_data.scopes,
+        "revoked": False,
+        "created_at": datetime.now(timezone.utc)
+    }
+    await db.api_keys.insert_one(key_doc)
+    
+    return {"api_key": api_key, **ApiKeyResponse(**key_doc).dict()}
+
+@api_router.get("/dealers/api-keys", response_model=List[ApiKeyResponse])
+async def get_api_keys(current_dealer: Dealer = Depends(get_current_dealer)):
+    keys = await db.api_keys.find({"dealer_id": current_dealer.id}).sort("created_at", -1).to_list(length=None)
+    return [ApiKeyResponse(**key) for key in keys]
+
+@api_router.delete("/dealers/api-keys/{key_id}")
+async def revoke_api_key(key_id: str, current_dealer: Dealer = Depends(get_current_dealer)):
+    key_doc = await db.api_keys.find_one_and_update(
+        {"id": key_id, "dealer_id": current_dealer.id},
+        {"$set": {"revoked": True}}
+    )
+    if not key_doc:
+        raise HTTPException(status_code=404, detail="API key not found")
+    
+    api_key_cache.invalidate(key_doc["key_hash"])
+    return {"message": "API key revoked successfully"}
+
+# Token Refresh Endpoints
+@api_router.post("/auth/refresh")
+async def refresh_access_token(request: RefreshTokenRequest):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    token_hash = _hash_refresh_token(request.refresh_token)
+    now = datetime.now(timezone.utc)
+    stored = await db.refresh_tokens.find_one_and_update(
+        {"token_hash": token_hash, "revoked": False, "expires_at": {"$gt": now}},
+        {"$set": {"revoked": True, "rotated_at": now}}
+    )
+    if not stored:
+        # A rotated token being replayed means it leaked: revoke the whole family
+        reused = await db.refresh_tokens.find_one({"token_hash": token_hash, "revoked": True})
+        if reused:
+            await db.refresh_tokens.update_many({"family_id": reused["family_id"]}, {"$set": {"revoked": True}})
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+    
+    if not await resolve_principal(stored["user_type"], stored["user_id"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Account not found or inactive"
+        )
+    
+    return await issue_token_pair(stored["user_id"], stored["user_type"], stored["family_id"])
+
+@api_router.post("/auth/logout")
+async def logout(request: RefreshTokenRequest, credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    """Revoke a refresh token family and, if presented, the current access token"""
+    stored = await db.refresh_tokens.find_one({"token_hash": _hash_refresh_token(request.refresh_token)})
+    if stored:
+        await db.refresh_tokens.update_many({"family_id": stored["family_id"]}, {"$set": {"revoked": True}})
+    
+    if credentials:
+        token_data = verify_jwt_token(credentials.credentials)
+        if token_data and token_data["jti"]:
+            await revoke_access_token(token_data["jti"], token_data["exp"])
+    
+    return {"message": "Logged out successfully"}
+
 # Admin Authentication Endpoints
 @api_router.post("/admin/login")
-async def login_admin(login_data: AdminLogin):
+async def login_admin(login_data: AdminLogin, request: Request):
+    await enforce_login_rate_limit(request, "admin", login_data.username)
+    
     admin = await db.admins.find_one({"username": login_data.username})
-    if not admin or not verify_password(login_data.password, admin["password"]):
+    if not await verify_login_password(login_data.password, admin):
+        await record_login_failure("admin", login_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password"
@@ -979,10 +1994,11 @@ async def login_admin(login_data: AdminLogin):
             detail="Admin account is inactive"
         )
     
-    token = create_jwt_token(admin["id"], "admin")
+    await rehash_password_if_needed("admins", admin, login_data.password)
+    
+    tokens = await issue_token_pair(admin["id"], "admin")
     return {
-        "access_token": token,
-        "token_type": "bearer",
+        **tokens,
         "admin": AdminResponse(**admin)
     }
 
@@ -1014,6 +2030,9 @@ async def approve_dealer(dealer_id: str, current_admin: Admin = Depends(get_curr
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Dealer not found")
     
+    invalidate_principal("dealer", dealer_id)
+    await event_bus.publish("dealer.status_changed", {"id": dealer_id, "status": "approved"})
+    
     return {"message": "Dealer approved successfully"}
 
 @api_router.put("/admin/dealers/{dealer_id}/reject")
@@ -1027,15 +2046,177 @@ async def reject_dealer(dealer_id: str, current_admin: Admin = Depends(get_curre
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Dealer not found")
     
+    invalidate_principal("dealer", dealer_id)
+    await revoke_subject_tokens("dealer", dealer_id)
+    await event_bus.publish("dealer.status_changed", {"id": dealer_id, "status": "rejected"})
+    
     return {"message": "Dealer rejected successfully"}
 
-# Enhanced Admin Endpoints for User Management
-@api_router.get("/admin/users")
-async def get_all_users(current_admin: Admin = Depends(get_current_admin)):
-    """Get all users"""
-    users = await db.users.find().to_list(length=None)
-    return [UserResponse(**{k: v for k, v in user.items() if k != "_id" and k != "password"}) for user in users]
-
+@api_router.put("/admin/dealers/{dealer_id}/tier")
+async def update_dealer_tier(dealer_id: str, tier_data: DealerTierUpdate, current_admin: Admin = Depends(get_current_admin)):
+    """Assign a dealer to a pricing tier"""
+    await pricing_engine.ensure_fresh()
+    if tier_data.pricing_tier not in pricing_engine.tier_index:
+        raise HTTPException(status_code=400, detail="Unknown pricing tier")
+    
+    result = await db.dealers.update_one(
+        {"id": dealer_id},
+        {"$set": {"pricing_tier": tier_data.pricing_tier}}
+    )
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Dealer not found")
+    
+    invalidate_principal("dealer", dealer_id)
+    
+    return {"message": "Dealer pricing tier updated successfully"}
+
+# Admin Endpoints for Pricing Rules
+@api_router.get("/admin/pricing/rules", response_model=PricingRules)
+async def get_pricing_rules(current_admin: Admin = Depends(get_current_admin)):
+    rules = await db.pricing_rules.find_one({"id": "default"}, {"_id": 0, "id": 0})
+    return PricingRules(**rules) if rules else DEFAULT_PRICING_RULES
+
+@api_router.put("/admin/pricing/rules", response_model=PricingRules)
+async def update_pricing_rules(rules: PricingRules, current_admin: Admin = Depends(get_current_admin)):
+    """Replace the pricing rules and rebuild the precomputed tier price lists"""
+    tier_names = [tier.name for tier in rules.tiers]
+    if RETAIL_TIER not in tier_names:
+        raise HTTPException(status_code=400, detail=f"Pricing rules must define the '{RETAIL_TIER}' tier")
+    if len(set(tier_names)) != len(tier_names):
+        raise HTTPException(status_code=400, detail="Duplicate pricing tier names")
+    unknown_tiers = {tier for vb in rules.volume_breaks for tier in vb.tiers or []} - set(tier_names)
+    if unknown_tiers:
+        raise HTTPException(status_code=400, detail=f"Volume breaks reference unknown tiers: {', '.join(sorted(unknown_tiers))}")
+    
+    rules.updated_at = datetime.now(timezone.utc)
+    await db.pricing_rules.replace_one({"id": "default"}, {"id": "default", **rules.dict()}, upsert=True)
+    await pricing_engine.rebuild()
+    return rules
+
+# Enhanced Admin Endpoints for User Management
+@api_router.get("/admin/users")
+async def get_all_users(current_admin: Admin = Depends(get_current_admin)):
+    """Get all users"""
+    users = await db.users.find().to_list(length=None)
+    return [UserResponse(**{k: v for k, v in user.items() if k != "_id" and k != "password"}) for user in users]
+
+# Admin exports stream from a Motor cursor as CSV or NDJSON, optionally gzipped,
+# so memory use stays flat however large the collection is.
+EXPORT_BATCH_ROWS = 500
+
+EXPORT_SPECS: Dict[str, Dict[str, Any]] = {
+    "quotes": {
+        "collection": "quotes",
+        "columns": [
+            "id", "created_at", "updated_at", "status", "version", "project_name", "intended_use",
+            "company_size", "budget_range", "total_amount", "user_id", "customer.name", "customer.email",
+            "customer.company_name", "delivery_date", "delivery_address", "billing_address",
+            "additional_requirements", "admin_notes", "items"
+        ],
+        "filters": {"status", "user_id"}
+    },
+    "users": {"collection": "users", "columns": list(User.model_fields), "filters": {"is_active"}},
+    "dealers": {"collection": "dealers", "columns": list(Dealer.model_fields), "filters": {"is_approved", "is_active"}},
+    "chat": {"collection": "chat_messages", "columns": list(ChatMessage.model_fields), "filters": {"user_id", "sender_type"}}
+}
+
+def export_value(document: dict, column: str):
+    value = document
+    for key in column.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+# Spreadsheets evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def export_csv_cell(value) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=jsonable_encoder)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        # Customer-entered text must not run as a formula when the export is opened
+        return "'" + value
+    return value
+
+async def export_rows(cursor, columns: List[str], export_format: str):
+    """Yield CSV or NDJSON text in chunks of EXPORT_BATCH_ROWS documents"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(columns)
+    rows = 0
+    async for document in cursor:
+        if export_format == "csv":
+            writer.writerow([export_csv_cell(export_value(document, column)) for column in columns])
+        else:
+            buffer.write(json.dumps({column: export_value(document, column) for column in columns}, default=jsonable_encoder))
+            buffer.write("\n")
+        rows += 1
+        if rows % EXPORT_BATCH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+async def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+@api_router.get("/admin/export/{dataset}")
+async def export_dataset(
+    dataset: Literal["quotes", "users", "dealers", "chat"],
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    compress: bool = Query(False, alias="gzip"),
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    sender_type: Optional[str] = None,
+    is_approved: Optional[bool] = None,
+    is_active: Optional[bool] = None,
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Stream a collection as CSV or NDJSON, filtered server-side and optionally gzipped"""
+    spec = EXPORT_SPECS[dataset]
+    filters = {
+        "status": status,
+        "user_id": user_id,
+        "sender_type": sender_type,
+        "is_approved": is_approved,
+        "is_active": is_active
+    }
+    query = {field: value for field, value in filters.items() if value is not None}
+    unsupported = set(query) - spec["filters"]
+    if unsupported:
+        raise HTTPException(status_code=400, detail=f"Unsupported filters for {dataset}: {', '.join(sorted(unsupported))}")
+    if created_from or created_to:
+        query["created_at"] = {}
+        if created_from:
+            query["created_at"]["$gte"] = created_from
+        if created_to:
+            query["created_at"]["$lt"] = created_to
+    
+    # Projecting the export columns keeps password hashes out of every export
+    projection = {"_id": 0, **{column.split(".")[0]: 1 for column in spec["columns"]}}
+    cursor = db[spec["collection"]].find(query, projection).batch_size(EXPORT_BATCH_ROWS)
+    chunks = export_rows(cursor, spec["columns"], export_format)
+    
+    filename = f"{dataset}-{datetime.now(timezone.utc):%Y%m%d}.{export_format}"
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
 @api_router.get("/admin/stats")
 async def get_admin_stats(current_admin: Admin = Depends(get_current_admin)):
     """Get admin dashboard statistics"""
@@ -1051,108 +2232,616 @@ async def get_admin_stats(current_admin: Admin = Depends(get_current_admin)):
         "chat_messages": await db.chat_messages.count_documents({})
     }
     return stats
-@api_router.post("/cart/add")
-async def add_to_cart(request: AddToCartRequest, current_user: User = Depends(get_current_user)):
-    # Check if product exists and is in stock
-    product = await db.products.find_one({"id": request.product_id})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    
-    if not product["in_stock"] or product["stock_quantity"] < request.quantity:
-        raise HTTPException(status_code=400, detail="Insufficient stock")
+
+@api_router.get("/admin/cache/stats")
+async def get_cache_stats(current_admin: Admin = Depends(get_current_admin)):
+    """Hit ratios for the in-process caches of this worker"""
+    return {
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "api_key_cache": api_key_cache.stats(),
+        "cart_store": cart_store.stats(),
+        "last_cart_compaction": last_cart_compaction
+    }
+
+# Cart Storage
+# Carts live behind a CartStore. MongoCartStore writes every mutation straight
+# to the carts collection as one atomic pipeline update; MemoryCartStore keeps
+# carts in process memory (a stand-in for a Redis-like cache) and flushes dirty
+# carts to the same collection in batches.
+#
+# Mongo is the default. CART_STORE=memory is only safe with a single uvicorn
+# worker: memory carts belong to one process, so with several workers a user
+# sees a different cart depending on which worker answers, and a quote can clear
+# a cart that another worker later flushes back. A crash also loses up to
+# CART_FLUSH_INTERVAL_SECONDS of cart edits.
+CART_STORE_BACKEND = os.environ.get("CART_STORE", "mongo")  # "mongo" or "memory"
+CART_FLUSH_INTERVAL_SECONDS = float(os.environ.get("CART_FLUSH_INTERVAL_SECONDS", "2"))
+CART_MAX_DIRTY = int(os.environ.get("CART_MAX_DIRTY", "500"))
+CART_STORE_MAX_CARTS = int(os.environ.get("CART_STORE_MAX_CARTS", "50000"))
+CART_RETENTION_DAYS = int(os.environ.get("CART_RETENTION_DAYS", "90"))
+CART_ARCHIVE_AFTER_DAYS = int(os.environ.get("CART_ARCHIVE_AFTER_DAYS", "30"))
+CART_COMPACTION_INTERVAL_SECONDS = float(os.environ.get("CART_COMPACTION_INTERVAL_SECONDS", "3600"))
+CART_COMPACTION_BATCH_SIZE = int(os.environ.get("CART_COMPACTION_BATCH_SIZE", "500"))
+QUOTE_CART_SWEEP_SECONDS = int(os.environ.get("QUOTE_CART_SWEEP_SECONDS", "60"))
+
+CART_TOTAL_EXPR = {"$round": [
+    {"$sum": {"$map": {"input": "$items", "in": {"$multiply": ["$$this.quantity", "$$this.price"]}}}},
+    2
+]}
+
+def _merge_lines_expr(lines: List[dict], replace_quantity: bool) -> dict:
+    """Expression merging ``lines`` into the stored items.
+
+    Matching lines get their quantity incremented (or replaced when
+    ``replace_quantity``), new products are appended with their price, and
+    lines left with a quantity of 0 are dropped.
+    """
+    items = {"$ifNull": ["$items", []]}
+    incoming = {"$literal": lines}
+    matching_quantity = {"$sum": {"$map": {
+        "input": {"$filter": {"input": incoming, "as": "line", "cond": {"$eq": ["$$line.product_id", "$$item.product_id"]}}},
+        "as": "line",
+        "in": "$$line.quantity"
+    }}}
+    existing = {"$map": {"input": items, "as": "item", "in": {"$cond": [
+        {"$in": ["$$item.product_id", {"$literal": [line["product_id"] for line in lines]}]},
+        {"$mergeObjects": ["$$item", {"quantity": matching_quantity if replace_quantity else {"$add": ["$$item.quantity", matching_quantity]}}]},
+        "$$item"
+    ]}}}
+    added = {"$filter": {
+        "input": incoming,
+        "as": "line",
+        "cond": {"$not": [{"$in": ["$$line.product_id", {"$ifNull": ["$items.product_id", []]}]}]}
+    }}
+    return {"$filter": {
+        "input": {"$concatArrays": [existing, added]},
+        "cond": {"$gt": ["$$this.quantity", 0]}
+    }}
+
+def _merge_lines(items: List[dict], lines: List[dict], replace_quantity: bool) -> List[dict]:
+    """Python counterpart of _merge_lines_expr for the in-memory store"""
+    incoming = {line["product_id"]: line for line in lines}
+    merged = []
+    for item in items:
+        line = incoming.pop(item["product_id"], None)
+        if line:
+            quantity = line["quantity"] if replace_quantity else item["quantity"] + line["quantity"]
+            item = {**item, "quantity": quantity}
+        merged.append(item)
+    merged.extend(dict(line) for line in incoming.values())
+    return [item for item in merged if item["quantity"] > 0]
+
+class CartStore:
+    """Operations shared by the cart store backends"""
+
+    async def merge(self, source_owner_id: str, target_owner_id: str) -> Optional[dict]:
+        """Claim the source cart, then fold its lines into the target with one add_items write.
+
+        Claiming removes the source first, so concurrent merges of the same
+        cart add its lines once.
+        """
+        source = await self.take(source_owner_id)
+        if not source or not source["items"]:
+            return None
+        return await self.add_items(target_owner_id, source["items"])
+
+class MongoCartStore(CartStore):
+    """Carts written straight to Mongo; every mutation is one atomic update"""
+
+    backend = "mongo"
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def _update(self, owner_id: str, items_expr: dict, upsert: bool = True) -> Optional[dict]:
+        now = datetime.now(timezone.utc)
+        pipeline = [
+            {"$set": {
+                "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+                "created_at": {"$ifNull": ["$created_at", now]},
+                "items": items_expr,
+                "updated_at": now
+            }},
+            {"$set": {"total": CART_TOTAL_EXPR}}
+        ]
+        try:
+            return await db.carts.find_one_and_update(
+                {"user_id": owner_id}, pipeline,
+                projection={"_id": 0}, upsert=upsert, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two requests raced to create the cart; the other insert won, so update it
+            return await db.carts.find_one_and_update(
+                {"user_id": owner_id}, pipeline,
+                projection={"_id": 0}, return_document=ReturnDocument.AFTER
+            )
+
+    async def get(self, owner_id: str) -> Optional[dict]:
+        return await db.carts.find_one({"user_id": owner_id}, {"_id": 0})
+
+    async def take(self, owner_id: str) -> Optional[dict]:
+        """Atomically remove and return a cart"""
+        return await db.carts.find_one_and_delete({"user_id": owner_id}, projection={"_id": 0})
+
+    async def add_items(self, owner_id: str, lines: List[dict]) -> dict:
+        """Add quantities to existing lines and append new ones"""
+        return await self._update(owner_id, _merge_lines_expr(lines, replace_quantity=False))
+
+    async def set_items(self, owner_id: str, lines: List[dict]) -> dict:
+        """Set line quantities; 0 removes the line"""
+        return await self._update(owner_id, _merge_lines_expr(lines, replace_quantity=True))
+
+    async def remove_item(self, owner_id: str, product_id: str) -> Optional[dict]:
+        return await self._update(owner_id, {"$filter": {
+            "input": "$items",
+            "cond": {"$ne": ["$$this.product_id", {"$literal": product_id}]}
+        }}, upsert=False)
+
+    async def clear(self, owner_id: str) -> Optional[dict]:
+        return await self._update(owner_id, {"$literal": []}, upsert=False)
+
+    async def delete(self, owner_id: str, durable: bool = False):
+        await db.carts.delete_one({"user_id": owner_id})
+
+    async def flush(self) -> int:
+        return 0
+
+    def forget(self, owner_ids: List[str]):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend}
+
+class MemoryCartStore(CartStore):
+    """Write-behind cart store that absorbs cart writes in memory.
+
+    Reads fall through to Mongo once per cart. Mutations only touch memory and
+    mark the cart dirty; a background task flushes dirty carts to the carts
+    collection every CART_FLUSH_INTERVAL_SECONDS, sooner once CART_MAX_DIRTY
+    carts are pending, and on shutdown. A crash loses at most one flush
+    interval of cart edits. Carts are per process, so this backend assumes a
+    single worker (or sticky sessions) and must be opted into with
+    CART_STORE=memory.
+    """
+
+    backend = "memory"
+
+    def __init__(self):
+        self._carts: OrderedDict = OrderedDict()  # owner_id -> cart dict, or None if known absent
+        self._dirty: set = set()
+        self._deleted: set = set()
+        self._flush_needed = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.flushed = 0
+
+    async def start(self):
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+        await self.flush()
+
+    async def _load(self, owner_id: str) -> Optional[dict]:
+        if owner_id not in self._carts:
+            cart = await db.carts.find_one({"user_id": owner_id}, {"_id": 0})
+            # Another request may have loaded or written the cart while we awaited
+            if owner_id not in self._carts:
+                self._carts[owner_id] = cart
+        self._carts.move_to_end(owner_id)
+        self._evict()
+        return self._carts[owner_id]
+
+    def _evict(self):
+        # Only clean carts can be dropped; dirty ones wait for the next flush
+        while len(self._carts) > CART_STORE_MAX_CARTS:
+            for owner_id in self._carts:
+                if owner_id not in self._dirty and owner_id not in self._deleted:
+                    del self._carts[owner_id]
+                    break
+            else:
+                return
+
+    def _store(self, owner_id: str, cart: dict) -> dict:
+        cart["total"] = round(sum(item["quantity"] * item["price"] for item in cart["items"]), 2)
+        cart["updated_at"] = datetime.now(timezone.utc)
+        self._carts[owner_id] = cart
+        self._deleted.discard(owner_id)
+        self._dirty.add(owner_id)
+        self._check_backlog()
+        return copy.deepcopy(cart)
+
+    def _check_backlog(self):
+        if len(self._dirty) + len(self._deleted) >= CART_MAX_DIRTY:
+            self._flush_needed.set()
+
+    async def _mutate(self, owner_id: str, mutate, create: bool) -> Optional[dict]:
+        cart = await self._load(owner_id)
+        if cart is None:
+            if not create:
+                return None
+            now = datetime.now(timezone.utc)
+            cart = {"id": str(uuid.uuid4()), "user_id": owner_id, "items": [], "total": 0.0, "created_at": now, "updated_at": now}
+        cart = {**cart, "items": mutate(cart["items"])}
+        return self._store(owner_id, cart)
+
+    async def get(self, owner_id: str) -> Optional[dict]:
+        cart = await self._load(owner_id)
+        return copy.deepcopy(cart) if cart is not None else None
+
+    async def take(self, owner_id: str) -> Optional[dict]:
+        """Remove and return a cart; nothing yields between the load and the delete"""
+        cart = await self._load(owner_id)
+        if cart is not None:
+            await self.delete(owner_id)
+        return cart
+
+    async def add_items(self, owner_id: str, lines: List[dict]) -> dict:
+        return await self._mutate(owner_id, lambda items: _merge_lines(items, lines, replace_quantity=False), create=True)
+
+    async def set_items(self, owner_id: str, lines: List[dict]) -> dict:
+        return await self._mutate(owner_id, lambda items: _merge_lines(items, lines, replace_quantity=True), create=True)
+
+    async def remove_item(self, owner_id: str, product_id: str) -> Optional[dict]:
+        return await self._mutate(owner_id, lambda items: [item for item in items if item["product_id"] != product_id], create=False)
+
+    async def clear(self, owner_id: str) -> Optional[dict]:
+        return await self._mutate(owner_id, lambda items: [], create=False)
+
+    async def delete(self, owner_id: str, durable: bool = False):
+        """Drop a cart; ``durable`` writes the delete through before returning"""
+        self._carts[owner_id] = None
+        self._dirty.discard(owner_id)
+        self._deleted.add(owner_id)
+        if durable:
+            # Under the flush lock so an in-flight flush can't write the cart back after us
+            async with self._flush_lock:
+                if owner_id in self._deleted:
+                    await db.carts.delete_one({"user_id": owner_id})
+                    self._deleted.discard(owner_id)
+        else:
+            self._check_backlog()
+
+    def forget(self, owner_ids: List[str]):
+        """Drop cached copies of carts archived in Mongo, unless they have pending writes"""
+        for owner_id in owner_ids:
+            if owner_id not in self._dirty and owner_id not in self._deleted:
+                self._carts.pop(owner_id, None)
+
+    async def flush(self) -> int:
+        """Write all dirty carts to Mongo in one unordered bulk write"""
+        async with self._flush_lock:
+            dirty, deleted = self._dirty, self._deleted
+            self._dirty, self._deleted = set(), set()
+            operations = [
+                ReplaceOne({"user_id": owner_id}, copy.deepcopy(self._carts[owner_id]), upsert=True)
+                for owner_id in dirty if self._carts.get(owner_id) is not None
+            ] + [DeleteOne({"user_id": owner_id}) for owner_id in deleted]
+            if not operations:
+                return 0
+            try:
+                await db.carts.bulk_write(operations, ordered=False)
+            except BaseException:
+                # Keep the carts pending so the next flush (or shutdown) retries them
+                self._dirty |= {owner_id for owner_id in dirty if self._carts.get(owner_id) is not None}
+                self._deleted |= deleted - self._dirty
+                raise
+            self.flushed += len(operations)
+            return len(operations)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_needed.wait(), timeout=CART_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_needed.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush carts")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "carts": len(self._carts),
+            "dirty": len(self._dirty) + len(self._deleted),
+            "flushed": self.flushed
+        }
+
+cart_store = MongoCartStore() if CART_STORE_BACKEND == "mongo" else MemoryCartStore()
+
+# Abandoned-cart compaction. Carts untouched for CART_ARCHIVE_AFTER_DAYS are moved
+# to carts_archive in batches; the TTL index on updated_at is the backstop at
+# CART_RETENTION_DAYS.
+last_cart_compaction: Dict[str, Any] = {}
+
+async def compact_carts() -> Dict[str, Any]:
+    """Archive stale carts batch by batch; returns how many were reclaimed"""
+    started = datetime.now(timezone.utc)
+    cutoff = started - timedelta(days=CART_ARCHIVE_AFTER_DAYS)
+    archived = 0
+    batches = 0
+    while True:
+        stale = await db.carts.find({"updated_at": {"$lt": cutoff}}).limit(CART_COMPACTION_BATCH_SIZE).to_list(length=None)
+        if not stale:
+            break
+        # Upsert by _id: a cart archived by an earlier run that was touched before
+        # its delete, or left behind by a crash, is refreshed instead of failing the batch
+        await db.carts_archive.bulk_write(
+            [ReplaceOne({"_id": cart["_id"]}, {**cart, "archived_at": started}, upsert=True) for cart in stale],
+            ordered=False
+        )
+        # Carts touched since they were read keep living in carts
+        result = await db.carts.delete_many({"_id": {"$in": [cart["_id"] for cart in stale]}, "updated_at": {"$lt": cutoff}})
+        cart_store.forget([cart["user_id"] for cart in stale])
+        archived += result.deleted_count
+        batches += 1
+        if len(stale) < CART_COMPACTION_BATCH_SIZE:
+            break
     
-    # Find or create cart for user
-    cart = await db.carts.find_one({"user_id": current_user.id})
+    last_cart_compaction.update({
+        "started_at": started,
+        "cutoff": cutoff,
+        "carts_reclaimed": archived,
+        "batches": batches,
+        "remaining_carts": await db.carts.estimated_document_count()
+    })
+    logger.info("Cart compaction archived %d carts in %d batches", archived, batches)
+    return dict(last_cart_compaction)
+
+async def cart_compaction_loop():
+    while True:
+        await asyncio.sleep(CART_COMPACTION_INTERVAL_SECONDS)
+        try:
+            await compact_carts()
+        except Exception:
+            logger.exception("Cart compaction failed")
+
+# Quote submission clears the cart outbox-style: quotes are inserted with
+# cart_clear_pending and the flag is dropped once the cart is gone. Quotes still
+# flagged after QUOTE_CART_SWEEP_SECONDS are finished here, leaving carts the
+# user has touched since submitting alone.
+async def sweep_quoted_carts() -> int:
+    """Clear carts for quotes whose submission stopped short; returns quotes settled"""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=QUOTE_CART_SWEEP_SECONDS)
+    pending = await db.quotes.find(
+        {"cart_clear_pending": True, "created_at": {"$lt": cutoff}},
+        {"_id": 0, "id": 1, "user_id": 1, "created_at": 1}
+    ).to_list(length=None)
+    for quote in pending:
+        cart = await cart_store.get(quote["user_id"])
+        if cart and _utc_timestamp(cart["updated_at"]) <= _utc_timestamp(quote["created_at"]):
+            await cart_store.delete(quote["user_id"], durable=True)
+        await db.quotes.update_one({"id": quote["id"]}, {"$unset": {"cart_clear_pending": ""}})
+    if pending:
+        logger.info("Settled cart clearing for %d quotes", len(pending))
+    return len(pending)
+
+async def quote_cart_sweep_loop():
+    while True:
+        try:
+            await sweep_quoted_carts()
+        except Exception:
+            logger.exception("Quote cart sweep failed")
+        await asyncio.sleep(QUOTE_CART_SWEEP_SECONDS)
+
+# Guest carts are keyed by a session id signed with the JWT secret and live in
+# the same cart store as user carts, under the owner id "guest:<session id>".
+# The session is "<session id>.<exp>.<signature>", with the expiry covered by the HMAC.
+GUEST_SESSION_TTL_SECONDS = int(os.environ.get("GUEST_SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+
+def _sign_guest_session(payload: str) -> str:
+    return hmac.new(JWT_SECRET.encode(), payload.encode(), hashlib.sha256).hexdigest()
+
+def create_guest_session() -> str:
+    payload = f"{secrets.token_urlsafe(16)}.{int(time.time()) + GUEST_SESSION_TTL_SECONDS}"
+    return f"{payload}.{_sign_guest_session(payload)}"
+
+def guest_cart_owner(guest_session: str) -> Optional[str]:
+    """Cart owner id for a signed guest session, or None if it is invalid or expired"""
+    payload, _, signature = guest_session.rpartition(".")
+    session_id, _, exp = payload.rpartition(".")
+    if not session_id or not hmac.compare_digest(signature, _sign_guest_session(payload)):
+        return None
+    if not exp.isdigit() or int(exp) <= time.time():
+        return None
+    return f"guest:{session_id}"
+
+async def get_cart_owner(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    guest_session: Optional[str] = Depends(guest_session_header)
+) -> str:
+    """Cart owner id: the logged-in user, otherwise the guest session"""
+    if credentials:
+        current_user = await get_current_user(credentials)
+        return current_user.id
+    owner_id = guest_cart_owner(guest_session) if guest_session else None
+    if not owner_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Login or a guest session is required"
+        )
+    return owner_id
+
+# Shopping Cart Endpoints
+@api_router.post("/guest/session")
+async def start_guest_session():
+    """Issue a signed guest session id for building a cart before logging in"""
+    return {"guest_session": create_guest_session(), "expires_in": GUEST_SESSION_TTL_SECONDS}
+
+async def price_cart_lines(requests: List[AddToCartRequest]) -> List[dict]:
+    """Validate and price requested cart lines with one product multi-get.
+
+    Duplicate product ids are merged. Raises 404 if any product is missing and
+    400 if any line exceeds available stock.
+    """
+    quantities: Dict[str, int] = {}
+    for request in requests:
+        quantities[request.product_id] = quantities.get(request.product_id, 0) + request.quantity
     
-    if not cart:
-        cart = Cart(user_id=current_user.id, items=[])
-        cart_dict = cart.dict()
-    else:
-        # Remove MongoDB _id field
-        cart_dict = {k: v for k, v in cart.items() if k != "_id"}
-    
-    # Check if item already in cart
-    item_found = False
-    for item in cart_dict["items"]:
-        if item["product_id"] == request.product_id:
-            item["quantity"] += request.quantity
-            item_found = True
-            break
+    products = await db.products.find(
+        {"id": {"$in": list(quantities)}},
+        {"_id": 0, "id": 1, "price": 1, "in_stock": 1, "stock_quantity": 1}
+    ).to_list(length=None)
+    products_by_id = {product["id"]: product for product in products}
     
-    if not item_found:
-        cart_dict["items"].append({
-            "product_id": request.product_id,
-            "quantity": request.quantity,
-            "price": product["price"]
-        })
+    missing = [product_id for product_id in quantities if product_id not in products_by_id]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product not found: {', '.join(missing)}")
     
-    # Calculate total
-    cart_dict["total"] = sum(item["quantity"] * item["price"] for item in cart_dict["items"])
-    cart_dict["updated_at"] = datetime.now(timezone.utc)
+    insufficient = [
+        product_id for product_id, quantity in quantities.items()
+        if quantity and (not products_by_id[product_id]["in_stock"] or products_by_id[product_id]["stock_quantity"] < quantity)
+    ]
+    if insufficient:
+        raise HTTPException(status_code=400, detail=f"Insufficient stock: {', '.join(insufficient)}")
     
-    # Save cart
-    await db.carts.replace_one(
-        {"user_id": current_user.id},
-        cart_dict,
-        upsert=True
+    # Price used for new lines; existing lines keep the price they were added at
+    await pricing_engine.ensure_fresh()
+    product_ids = list(quantities)
+    unit_prices = pricing_engine.price(RETAIL_TIER, product_ids)
+    return [
+        {
+            "product_id": product_id,
+            "quantity": quantities[product_id],
+            "price": products_by_id[product_id]["price"] if np.isnan(unit_price) else float(unit_price)
+        }
+        for product_id, unit_price in zip(product_ids, unit_prices)
+    ]
+
+async def apply_cart_pricing(cart_dict: dict) -> dict:
+    """Price every line with volume breaks; ``total`` is what the customer pays and
+    ``subtotal`` the sum at the prices the lines were added at"""
+    items = cart_dict["items"]
+    await pricing_engine.ensure_fresh()
+    unit_prices = pricing_engine.price(
+        RETAIL_TIER,
+        [item["product_id"] for item in items],
+        [item["quantity"] for item in items]
     )
-    
-    return {"message": "Item added to cart", "cart": cart_dict}
+    for item, unit_price in zip(items, unit_prices):
+        item["unit_price"] = item["price"] if np.isnan(unit_price) else float(unit_price)
+        item["line_total"] = round(item["unit_price"] * item["quantity"], 2)
+    cart_dict["subtotal"] = cart_dict.get("total", 0.0)
+    cart_dict["total"] = round(sum(item["line_total"] for item in items), 2)
+    return cart_dict
+
+@api_router.post("/admin/carts/compact")
+async def run_cart_compaction(current_admin: Admin = Depends(get_current_admin)):
+    """Archive abandoned carts now instead of waiting for the background job"""
+    await cart_store.flush()
+    return await compact_carts()
+
+@api_router.post("/admin/quotes/sweep-carts")
+async def run_quote_cart_sweep(current_admin: Admin = Depends(get_current_admin)):
+    """Settle quotes whose cart clearing is still pending instead of waiting for the background job"""
+    return {"quotes_settled": await sweep_quoted_carts()}
+
+@api_router.post("/cart/add")
+async def add_to_cart(request: AddToCartRequest, owner_id: str = Depends(get_cart_owner)):
+    # Check if product exists and is in stock
+    lines = await price_cart_lines([request])
+    cart_dict = await cart_store.add_items(owner_id, lines)
+    return {"message": "Item added to cart", "cart": await apply_cart_pricing(cart_dict)}
+
+@api_router.post("/cart/items:batch")
+async def add_cart_items_batch(request: CartBatchRequest, owner_id: str = Depends(get_cart_owner)):
+    """Add many items at once, e.g. when importing a requisition"""
+    lines = await price_cart_lines(request.items)
+    cart_dict = await cart_store.add_items(owner_id, lines)
+    return {"message": f"{len(lines)} items added to cart", "cart": await apply_cart_pricing(cart_dict)}
+
+@api_router.patch("/cart/items/{product_id}")
+async def update_cart_item(product_id: str, update: CartItemUpdate, owner_id: str = Depends(get_cart_owner)):
+    """Set a line's quantity; a quantity of 0 removes it"""
+    if update.quantity == 0:
+        cart_dict = await cart_store.remove_item(owner_id, product_id)
+        if not cart_dict:
+            raise HTTPException(status_code=404, detail="Cart not found")
+    else:
+        lines = await price_cart_lines([AddToCartRequest(product_id=product_id, quantity=update.quantity)])
+        cart_dict = await cart_store.set_items(owner_id, lines)
+    return {"message": "Cart item updated", "cart": await apply_cart_pricing(cart_dict)}
+
+@api_router.delete("/cart")
+async def clear_cart(owner_id: str = Depends(get_cart_owner)):
+    await cart_store.clear(owner_id)
+    return {"message": "Cart cleared"}
 
 @api_router.get("/cart")
-async def get_cart(current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id})
+async def get_cart(owner_id: str = Depends(get_cart_owner)):
+    cart = await cart_store.get(owner_id)
     if not cart:
         return {"items": [], "total": 0.0}
     
-    # Get product details for each item
+    # Get product details for all items in one query, projected to what the cart shows
+    product_ids = [item["product_id"] for item in cart["items"]]
+    products = await db.products.find(
+        {"id": {"$in": product_ids}},
+        CART_PRODUCT_PROJECTION
+    ).to_list(length=None)
+    products_by_id = {product["id"]: product for product in products}
+    
     enriched_items = []
     for item in cart["items"]:
-        product = await db.products.find_one({"id": item["product_id"]})
+        product = products_by_id.get(item["product_id"])
         if product:
-            # Remove MongoDB _id field to avoid serialization issues
-            product_dict = {k: v for k, v in product.items() if k != "_id"}
             enriched_items.append({
                 **item,
-                "product": Product(**product_dict)
+                "product": CartProduct(**product)
             })
     
     # Remove MongoDB _id field from cart
     cart_dict = {k: v for k, v in cart.items() if k != "_id"}
     cart_dict["items"] = enriched_items
-    return cart_dict
+    return await apply_cart_pricing(cart_dict)
 
 @api_router.delete("/cart/item/{product_id}")
-async def remove_from_cart(product_id: str, current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id})
+async def remove_from_cart(product_id: str, owner_id: str = Depends(get_cart_owner)):
+    cart = await cart_store.remove_item(owner_id, product_id)
     if not cart:
         raise HTTPException(status_code=404, detail="Cart not found")
     
-    # Remove MongoDB _id field
-    cart_dict = {k: v for k, v in cart.items() if k != "_id"}
-    cart_dict["items"] = [item for item in cart_dict["items"] if item["product_id"] != product_id]
-    cart_dict["total"] = sum(item["quantity"] * item["price"] for item in cart_dict["items"])
-    cart_dict["updated_at"] = datetime.now(timezone.utc)
-    
-    await db.carts.replace_one({"user_id": current_user.id}, cart_dict)
     return {"message": "Item removed from cart"}
 
 # Quote System Endpoints
 @api_router.post("/quotes")
 async def create_quote(quote_data: QuoteCreate, current_user: User = Depends(get_current_user)):
+    # Snapshot the products in one multi-get so rendering the quote never reads the catalog
+    product_ids = [item.product_id for item in quote_data.items]
+    products = await db.products.find({"id": {"$in": product_ids}}, {**QUOTE_SNAPSHOT_PROJECTION, "price": 1}).to_list(length=None)
+    products_by_id = {product["id"]: product for product in products}
+    
+    # Price every item (tier price plus volume breaks) in one vectorized lookup
+    await pricing_engine.ensure_fresh()
+    unit_prices = pricing_engine.price(
+        RETAIL_TIER,
+        product_ids,
+        [item.quantity for item in quote_data.items]
+    )
     total_amount = 0
-    # Assign actual product price to each item
-    for item in quote_data.items:
-        product = await db.products.find_one({"id": item.product_id})
-        if product and "price" in product:
-            item.price = product["price"]  # <-- assign actual price
-            total_amount += product["price"] * item.quantity
+    for item, unit_price in zip(quote_data.items, unit_prices):
+        product = products_by_id.get(item.product_id, {})
+        if np.isnan(unit_price):
+            # Not in this worker's engine snapshot yet: list price, or 0 if the product is gone
+            item.price = float(product.get("price", 0))
         else:
-            item.price = 0  # fallback if product not found
+            item.price = float(unit_price)
+        for field in QUOTE_SNAPSHOT_FIELDS:
+            setattr(item, field, product.get(field))
+        total_amount += item.price * item.quantity
+    total_amount = round(total_amount, 2)
     
     # Create quote with updated items
     quote = Quote(
         user_id=current_user.id,
+        customer=QuoteCustomer.from_user(current_user.dict()),
         items=quote_data.items,  # now contains correct prices
         total_amount=total_amount,  # use total calculated above
         project_name=quote_data.project_name,
@@ -1165,65 +2854,515 @@ async def create_quote(quote_data: QuoteCreate, current_user: User = Depends(get
         additional_requirements=quote_data.additional_requirements
     )
     
-    await db.quotes.insert_one(quote.dict())
-    
-    # Clear user's cart after quote submission
-    await db.carts.delete_one({"user_id": current_user.id})
+    # The pending flag is the outbox entry: a quote that outlives a crash before
+    # its cart is cleared is finished by sweep_quoted_carts
+    quote_document = quote.dict()
+    await db.quotes.insert_one({**quote_document, "cart_clear_pending": True})
+    await apply_quote_rollup(None, quote_document)
+    await event_bus.publish("quote.created", {
+        "id": quote.id,
+        "project_name": quote.project_name,
+        "status": quote.status,
+        "total_amount": quote.total_amount,
+        "user_name": quote.customer.name,
+        "company_name": quote.customer.company_name,
+        "created_at": quote.created_at
+    })
+    # The flag may only go once the delete is in Mongo, not just in the write-behind store
+    await cart_store.delete(current_user.id, durable=True)
+    await db.quotes.update_one({"id": quote.id}, {"$unset": {"cart_clear_pending": ""}})
     
     return {"message": "Quote submitted successfully", "quote_id": quote.id}
 
-@api_router.get("/quotes", response_model=List[QuoteResponse])
-async def get_user_quotes(current_user: User = Depends(get_current_user)):
-    quotes = await db.quotes.find({"user_id": current_user.id}).sort("created_at", -1).to_list(length=None)
-    
-    quote_responses = []
-    for quote in quotes:
-        quote_dict = {k: v for k, v in quote.items() if k != "_id"}
-        
-        # Hide total if not approved
-        if quote_dict.get("status") != "approved":
-            quote_dict["total_amount"] = 0  # or None
+# Quote analytics are served from quote_rollups: one document per creation month,
+# dimension and value holding the count and total value of matching quotes. Every
+# quote write moves the quote's contribution from its old state to its new one.
+QUOTE_ROLLUP_DIMENSIONS = ("status", "intended_use", "company_size")
 
-        quote_responses.append(QuoteResponse(
-            **quote_dict,
-            user_name=f"{current_user.first_name} {current_user.last_name}",
-            user_email=current_user.email,
-            company_name=current_user.company_name
-        ))
-    
-    return quote_responses
+def quote_rollup_cells(quote: dict) -> List[tuple]:
+    """(month, dimension, value) keys for a quote; empty and missing values share "unspecified".
 
-# Admin Endpoints for Quote Management
-@api_router.get("/admin/quotes", response_model=List[QuoteResponse])
-async def get_all_quotes():
-    quotes = await db.quotes.find().sort("created_at", -1).to_list(length=None)
-    quote_responses = []
-    for quote in quotes:
-        user = await db.users.find_one({"id": quote["user_id"]})
-        quote_dict = {k: v for k, v in quote.items() if k != "_id"}  # ✅ keeps total_amount too
-        if user:
-            quote_responses.append(QuoteResponse(
-                **quote_dict,
-                user_name=f"{user['first_name']} {user['last_name']}",
-                user_email=user["email"],
-                company_name=user.get("company_name")
-            ))
-    return quote_responses
+    Both the incremental path and the full rebuild key cells through here, so
+    the two can never bucket a quote differently.
+    """
+    created_at = quote["created_at"]
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    month = created_at.strftime("%Y-%m")
+    return [(month, dimension, quote.get(dimension) or "unspecified") for dimension in QUOTE_ROLLUP_DIMENSIONS]
 
-@api_router.put("/admin/quotes/{quote_id}/status")
-async def update_quote_status(quote_id: str, status: str, admin_notes: str = ""):
-    quote = await db.quotes.find_one({"id": quote_id})
+async def apply_quote_rollup(before: Optional[dict], after: Optional[dict]):
+    """Apply the difference between two states of a quote in one bulk write"""
+    deltas: Dict[tuple, List[float]] = {}
+    for quote, sign in ((before, -1), (after, 1)):
+        if not quote:
+            continue
+        for cell in quote_rollup_cells(quote):
+            delta = deltas.setdefault(cell, [0, 0.0])
+            delta[0] += sign
+            delta[1] += sign * (quote.get("total_amount") or 0)
+    operations = [
+        UpdateOne(
+            {"_id": "|".join(cell)},
+            {
+                "$inc": {"count": count, "total_amount": total},
+                "$setOnInsert": {"month": cell[0], "dimension": cell[1], "value": cell[2]}
+            },
+            upsert=True
+        )
+        for cell, (count, total) in deltas.items()
+        if count or total
+    ]
+    if operations:
+        await db.quote_rollups.bulk_write(operations, ordered=False)
+
+async def rebuild_quote_rollups() -> int:
+    """Recompute every rollup from the quotes collection; returns the number of cells"""
+    totals: Dict[tuple, List[float]] = {}
+    projection = {"_id": 0, "created_at": 1, "total_amount": 1, **{dimension: 1 for dimension in QUOTE_ROLLUP_DIMENSIONS}}
+    async for quote in db.quotes.find({}, projection).batch_size(1000):
+        for cell in quote_rollup_cells(quote):
+            total = totals.setdefault(cell, [0, 0.0])
+            total[0] += 1
+            total[1] += quote.get("total_amount") or 0
+    cells = [
+        {
+            "_id": "|".join(cell),
+            "month": cell[0],
+            "dimension": cell[1],
+            "value": cell[2],
+            "count": count,
+            "total_amount": total_amount
+        }
+        for cell, (count, total_amount) in totals.items()
+    ]
+    await db.quote_rollups.delete_many({})
+    if cells:
+        await db.quote_rollups.insert_many(cells)
+    logger.info("Rebuilt %d quote rollup cells", len(cells))
+    return len(cells)
+
+async def backfill_quote_customers(batch_size: int = 500) -> int:
+    """Attach customer snapshots to quotes created before they were recorded"""
+    backfilled = 0
+    while True:
+        quotes = await db.quotes.find({"customer": None}, {"_id": 0, "id": 1, "user_id": 1}).limit(batch_size).to_list(length=None)
+        if not quotes:
+            break
+        users = await db.users.find(
+            {"id": {"$in": list({quote["user_id"] for quote in quotes})}},
+            {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "email": 1, "company_name": 1}
+        ).to_list(length=None)
+        users_by_id = {user["id"]: user for user in users}
+        # Quotes whose user is gone get an empty snapshot so they are not revisited
+        await db.quotes.bulk_write([
+            UpdateOne(
+                {"id": quote["id"]},
+                {"$set": {"customer": QuoteCustomer.from_user(users_by_id[quote["user_id"]]).dict() if quote["user_id"] in users_by_id else {}}}
+            )
+            for quote in quotes
+        ], ordered=False)
+        backfilled += len(quotes)
+        if len(quotes) < batch_size:
+            break
+    if backfilled:
+        logger.info("Backfilled customer snapshots on %d quotes", backfilled)
+    return backfilled
+
+async def ensure_quote_rollups():
+    if not await db.quote_rollups.find_one() and await db.quotes.find_one():
+        await rebuild_quote_rollups()
+
+# Quote listings page with keysets on (created_at, id), newest first. The cursor
+# is the key of the last quote on the previous page.
+QUOTE_SORT = [("created_at", -1), ("id", -1)]
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def encode_quote_cursor(quote: dict) -> str:
+    key = {"t": round(_utc_timestamp(quote["created_at"]) * 1000), "id": quote["id"]}
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def quote_cursor_filter(cursor: str) -> dict:
+    """Match quotes that sort after the cursor; 400 on a malformed cursor"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = _EPOCH + timedelta(milliseconds=int(key["t"]))
+        quote_id = str(key["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": quote_id}}
+    ]}
+
+async def next_quote_cursor(match: dict, limit: int) -> Optional[str]:
+    """Cursor for the page after this one, read from the index before the page streams"""
+    keys = await db.quotes.find(match, {"_id": 0, "created_at": 1, "id": 1}).sort(QUOTE_SORT).skip(limit - 1).limit(2).to_list(length=2)
+    return encode_quote_cursor(keys[0]) if len(keys) == 2 else None
+
+async def stream_json_array(cursor):
+    """Yield documents from a Motor cursor as one JSON array"""
+    yield "["
+    separator = ""
+    async for document in cursor:
+        yield separator + json.dumps(document, default=jsonable_encoder)
+        separator = ","
+    yield "]"
+
+async def stream_quote_page(match: dict, cursor: Optional[str], limit: int, stages: List[dict]) -> StreamingResponse:
+    """Stream one page of quotes matching ``match``, shaped by the trailing ``stages``"""
+    if cursor:
+        match = {"$and": [match, quote_cursor_filter(cursor)]}
+    next_cursor = await next_quote_cursor(match, limit)
+    pipeline = [{"$match": match}, {"$sort": dict(QUOTE_SORT)}, {"$limit": limit}, *stages]
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return StreamingResponse(stream_json_array(db.quotes.aggregate(pipeline)), media_type="application/json", headers=headers)
+
+# Users only see a quote's total once it is approved
+USER_QUOTE_TOTAL_EXPR = {"$cond": [{"$eq": ["$status", "approved"]}, "$total_amount", 0]}
+
+@api_router.get("/quotes", response_model=List[Union[QuoteResponse, QuoteSummary]])
+async def get_user_quotes(
+    view: Literal["full", "summary"] = "full",
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user)
+):
+    """Page through the user's quotes, newest first; the next page's cursor is in X-Next-Cursor.
+
+    The summary view leaves out items and addresses; fetch /quotes/{id} for the full quote.
+    """
+    if view == "summary":
+        stages = [{"$project": {
+            "_id": 0,
+            "id": 1,
+            "project_name": 1,
+            "intended_use": 1,
+            "status": 1,
+            "item_count": {"$size": "$items"},
+            "total_amount": USER_QUOTE_TOTAL_EXPR,
+            "created_at": 1,
+            "updated_at": 1
+        }}]
+    else:
+        stages = [
+            {"$project": {"_id": 0, "cart_clear_pending": 0, "customer": 0}},
+            {"$addFields": {
+                "total_amount": USER_QUOTE_TOTAL_EXPR,
+                "user_name": {"$literal": f"{current_user.first_name} {current_user.last_name}"},
+                "user_email": {"$literal": current_user.email},
+                "company_name": {"$literal": current_user.company_name}
+            }}
+        ]
+    return await stream_quote_page({"user_id": current_user.id}, cursor, limit, stages)
+
+@api_router.get("/quotes/{quote_id}", response_model=QuoteResponse)
+async def get_user_quote(quote_id: str, current_user: User = Depends(get_current_user)):
+    quote = await db.quotes.find_one({"id": quote_id, "user_id": current_user.id}, {"_id": 0})
     if not quote:
         raise HTTPException(status_code=404, detail="Quote not found")
+    if quote.get("status") != "approved":
+        quote["total_amount"] = 0
+    return QuoteResponse(
+        **quote,
+        user_name=f"{current_user.first_name} {current_user.last_name}",
+        user_email=current_user.email,
+        company_name=current_user.company_name
+    )
+
+# Admin Endpoints for Quote Management
+@api_router.get("/admin/quotes", response_model=List[QuoteResponse])
+async def get_all_quotes(
+    status: Optional[str] = None,
+    user_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Page through all quotes, newest first; the next page's cursor is in X-Next-Cursor"""
+    match: Dict[str, Any] = {}
+    if status:
+        match["status"] = status
+    if user_id:
+        match["user_id"] = user_id
+    if created_from or created_to:
+        match["created_at"] = {}
+        if created_from:
+            match["created_at"]["$gte"] = created_from
+        if created_to:
+            match["created_at"]["$lt"] = created_to
+    stages = [
+        {"$lookup": {
+            "from": "users",
+            "localField": "user_id",
+            "foreignField": "id",
+            "as": "user"
+        }},
+        {"$unwind": "$user"},
+        {"$addFields": {
+            "user_name": {"$concat": ["$user.first_name", " ", "$user.last_name"]},
+            "user_email": "$user.email",
+            "company_name": {"$ifNull": ["$user.company_name", None]}
+        }},
+        {"$project": {"_id": 0, "user": 0, "cart_clear_pending": 0, "customer": 0}}
+    ]
+    return await stream_quote_page(match, cursor, limit, stages)
+
+# Admin quote search runs on a weighted text index over the quote, its customer
+# snapshot and item snapshots, ranked by text score and then recency.
+QUOTE_SEARCH_WEIGHTS = {
+    "project_name": 10,
+    "customer.company_name": 8,
+    "customer.name": 6,
+    "items.name": 4,
+    "intended_use": 2,
+    "additional_requirements": 1
+}
+
+@api_router.get("/admin/quotes/search", response_model=List[QuoteResponse])
+async def search_quotes(
+    q: str = Query(..., min_length=1, max_length=200),
+    status: Optional[str] = None,
+    skip: int = Query(0, ge=0, le=1000),
+    limit: int = Query(20, ge=1, le=100),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Ranked full-text search over quotes; each hit carries its text score"""
+    match: Dict[str, Any] = {"$text": {"$search": q}}
+    if status:
+        match["status"] = status
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"score": {"$meta": "textScore"}, "created_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$addFields": {
+            "score": {"$meta": "textScore"},
+            "user_name": "$customer.name",
+            "user_email": "$customer.email",
+            "company_name": "$customer.company_name"
+        }},
+        {"$project": {"_id": 0, "cart_clear_pending": 0, "customer": 0}}
+    ]
+    return StreamingResponse(stream_json_array(db.quotes.aggregate(pipeline)), media_type="application/json")
 
+@api_router.put("/admin/quotes/{quote_id}/status")
+async def update_quote_status(quote_id: str, status: str, admin_notes: str = "", current_admin: Admin = Depends(get_current_admin)):
     update_data = {
         "status": status,
-        "admin_notes": admin_notes
+        "admin_notes": admin_notes,
+        "updated_at": datetime.now(timezone.utc)
     }
 
-    await db.quotes.update_one({"id": quote_id}, {"$set": update_data})
+    quote = await db.quotes.find_one_and_update({"id": quote_id}, {"$set": update_data, "$inc": {"version": 1}}, projection={"_id": 0})
+    if not quote:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    await apply_quote_rollup(quote, {**quote, **update_data})
+    await event_bus.publish("quote.status_changed", {"id": quote_id, "status": status, "previous_status": quote.get("status")})
     return {"message": "Quote status updated successfully"}
 
+@api_router.get("/admin/analytics/quotes")
+async def get_quote_analytics(
+    dimension: Literal["status", "intended_use", "company_size"] = "status",
+    from_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    to_month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    current_admin: Admin = Depends(get_current_admin)
+):
+    """Monthly quote count and value, broken down by one dimension"""
+    query: Dict[str, Any] = {"dimension": dimension, "count": {"$gt": 0}}
+    if from_month or to_month:
+        query["month"] = {}
+        if from_month:
+            query["month"]["$gte"] = from_month
+        if to_month:
+            query["month"]["$lte"] = to_month
+    cells = await db.quote_rollups.find(query, {"_id": 0, "month": 1, "value": 1, "count": 1, "total_amount": 1}).sort("month", 1).to_list(length=None)
+    
+    buckets: Dict[str, dict] = {}
+    for cell in cells:
+        bucket = buckets.setdefault(cell["month"], {"month": cell["month"], "count": 0, "total_amount": 0.0, "values": {}})
+        bucket["values"][cell["value"]] = {"count": cell["count"], "total_amount": round(cell["total_amount"], 2)}
+        bucket["count"] += cell["count"]
+        bucket["total_amount"] += cell["total_amount"]
+    for bucket in buckets.values():
+        bucket["total_amount"] = round(bucket["total_amount"], 2)
+    return {"dimension": dimension, "buckets": list(buckets.values())}
+
+@api_router.post("/admin/analytics/quotes/rebuild")
+async def rebuild_quote_analytics(current_admin: Admin = Depends(get_current_admin)):
+    """Recompute the quote rollups from scratch, e.g. after importing quotes directly"""
+    return {"message": "Quote rollups rebuilt", "cells": await rebuild_quote_rollups()}
+
+# Quote PDFs are rendered in a process pool so layout work never runs on the event
+# loop. Files are cached under QUOTE_PDF_CACHE_DIR as <quote id>-<updated_at ms>.pdf,
+# so any quote update produces a new file and older versions are removed.
+QUOTE_PDF_WORKERS = int(os.environ.get("QUOTE_PDF_WORKERS", "2"))
+QUOTE_PDF_CACHE_DIR = Path(os.environ.get("QUOTE_PDF_CACHE_DIR", str(Path(tempfile.gettempdir()) / "quote-pdfs")))
+# Spawned workers avoid forking a process that already runs Motor and executor threads
+quote_pdf_executor = ProcessPoolExecutor(max_workers=QUOTE_PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+_quote_pdf_slots: Optional[asyncio.Semaphore] = None
+_quote_pdf_renders: Dict[Path, asyncio.Future] = {}
+
+PDF_PAGE_HEIGHT = 792
+PDF_MARGIN = 50
+PDF_LINE_WIDTH = 85  # Courier 10pt characters across the printable width
+
+def _pdf_escape(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("latin-1", "replace")
+
+def build_text_pdf(lines: List[tuple]) -> bytes:
+    """Minimal PDF of Courier text; ``lines`` are (font size, text) pairs, paginated as needed"""
+    pages: List[List[tuple]] = [[]]
+    y = PDF_PAGE_HEIGHT - PDF_MARGIN
+    for size, text in lines:
+        y -= size * 1.5
+        if y < PDF_MARGIN:
+            pages.append([])
+            y = PDF_PAGE_HEIGHT - PDF_MARGIN - size * 1.5
+        pages[-1].append((size, y, text))
+
+    # 1 catalog, 2 page tree, 3 font, then a page and content stream per page
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"
+    }
+    kids = []
+    for index, page in enumerate(pages):
+        page_id, content_id = 4 + index * 2, 5 + index * 2
+        stream = b"\n".join(
+            b"BT /F1 %d Tf %d %.1f Td (%s) Tj ET" % (size, PDF_MARGIN, y, _pdf_escape(text))
+            for size, y, text in page
+        )
+        objects[page_id] = (
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 %d] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PDF_PAGE_HEIGHT, content_id)
+        )
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        kids.append(b"%d 0 R" % page_id)
+    objects[2] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_id in range(1, len(objects) + 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+def quote_pdf_lines(quote: dict, customer: dict) -> List[tuple]:
+    approved = quote.get("status") == "approved"
+    lines = [(18, "OEH TRADERS"), (14, f"Quote: {quote['project_name']}"), (10, "")]
+    details = [
+        f"Reference: {quote['id']}",
+        f"Submitted: {quote['created_at']:%Y-%m-%d}",
+        f"Status: {quote.get('status', 'pending').capitalize()}",
+        "",
+        f"Customer: {customer.get('name') or '-'}",
+        f"Company: {customer.get('company_name') or '-'}",
+        f"Email: {customer.get('email', '')}",
+        f"Intended use: {quote.get('intended_use', '')}",
+        f"Delivery date: {quote['delivery_date']:%Y-%m-%d}" if quote.get("delivery_date") else "Delivery date: -",
+        f"Delivery address: {quote.get('delivery_address', '')}",
+        f"Billing address: {quote.get('billing_address', '')}",
+        "",
+        f"{'Qty':>5}  {'Item':<52}{'Unit':>12}{'Total':>14}",
+        "-" * PDF_LINE_WIDTH
+    ]
+    for item in quote["items"]:
+        name = item.get("name") or item.get("notes") or item["product_id"]
+        if item.get("brand"):
+            name = f"{name} ({item['brand']})"
+        unit = f"{item['price']:.2f}" if approved else "-"
+        total = f"{item['price'] * item['quantity']:.2f}" if approved else "-"
+        wrapped = textwrap.wrap(name, 50) or [""]
+        details.append(f"{item['quantity']:>5}  {wrapped[0]:<52}{unit:>12}{total:>14}")
+        details.extend(f"{'':7}{line}" for line in wrapped[1:])
+    details.append("-" * PDF_LINE_WIDTH)
+    details.append(f"Total: ${quote.get('total_amount', 0):.2f}" if approved else "Total: pending review")
+    if quote.get("admin_notes"):
+        details.extend(["", "Notes:"])
+        details.extend(textwrap.wrap(quote["admin_notes"], PDF_LINE_WIDTH))
+    if quote.get("additional_requirements"):
+        details.extend(["", "Additional requirements:"])
+        details.extend(textwrap.wrap(quote["additional_requirements"], PDF_LINE_WIDTH))
+    lines.extend((10, line) for line in details)
+    return lines
+
+def render_quote_pdf(quote: dict, customer: dict, path: str):
+    """Process pool job: write the quote PDF to ``path`` and drop older versions"""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temporary = target.with_suffix(f".{os.getpid()}.tmp")
+    temporary.write_bytes(build_text_pdf(quote_pdf_lines(quote, customer)))
+    os.replace(temporary, target)
+    quote_id = quote["id"]
+    for stale in target.parent.glob(f"{quote_id}-*.pdf"):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+
+async def quote_pdf_path(quote: dict) -> Path:
+    """Path of the quote's cached PDF, rendering it in the process pool on a miss"""
+    path = QUOTE_PDF_CACHE_DIR / f"{quote['id']}-{round(_utc_timestamp(quote['updated_at']) * 1000)}.pdf"
+    if path.exists():
+        return path
+    # Concurrent requests for the same version share one render
+    render = _quote_pdf_renders.get(path)
+    if render is None:
+        render = asyncio.ensure_future(_render_quote_pdf(quote, path))
+        _quote_pdf_renders[path] = render
+        render.add_done_callback(lambda _: _quote_pdf_renders.pop(path, None))
+    await asyncio.shield(render)
+    return path
+
+async def snapshot_legacy_quote_customer(quote: dict) -> dict:
+    """Customer for a quote made before snapshots, saved onto the quote so later renders match"""
+    user = await db.users.find_one(
+        {"id": quote["user_id"]},
+        {"_id": 0, "first_name": 1, "last_name": 1, "email": 1, "company_name": 1}
+    )
+    if not user:
+        return {}
+    customer = QuoteCustomer.from_user(user).dict()
+    await db.quotes.update_one({"id": quote["id"], "customer": None}, {"$set": {"customer": customer}})
+    return customer
+
+async def _render_quote_pdf(quote: dict, path: Path):
+    global _quote_pdf_slots
+    if _quote_pdf_slots is None:
+        _quote_pdf_slots = asyncio.Semaphore(QUOTE_PDF_WORKERS * 2)
+    customer = quote.get("customer") or await snapshot_legacy_quote_customer(quote)
+    async with _quote_pdf_slots:
+        await asyncio.get_running_loop().run_in_executor(quote_pdf_executor, render_quote_pdf, quote, customer, str(path))
+
+async def get_quote_viewer(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Token data for a logged-in user or admin"""
+    token_data = verify_jwt_token(credentials.credentials)
+    if token_data and token_data["user_type"] in ("user", "admin"):
+        if await resolve_principal(token_data["user_type"], token_data["user_id"]):
+            return token_data
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired token"
+    )
+
+@api_router.get("/quotes/{quote_id}/pdf")
+async def get_quote_pdf(quote_id: str, viewer: dict = Depends(get_quote_viewer)):
+    """Download a quote as PDF; users can only fetch their own quotes"""
+    query = {"id": quote_id}
+    if viewer["user_type"] == "user":
+        query["user_id"] = viewer["user_id"]
+    quote = await db.quotes.find_one(query, {"_id": 0})
+    if not quote:
+        raise HTTPException(status_code=404, detail="Quote not found")
+    path = await quote_pdf_path(quote)
+    return FileResponse(path, media_type="application/pdf", filename=f"quote-{quote_id}.pdf")
+
 # Chat System Endpoints
 @api_router.post("/chat/send")
 async def send_message(message_data: ChatMessageCreate, current_user: User = Depends(get_current_user)):
@@ -1236,6 +3375,7 @@ async def send_message(message_data: ChatMessageCreate, current_user: User = Dep
     )
     
     await db.chat_messages.insert_one(message.dict())
+    await event_bus.publish("chat.message", message.dict())
     return {"message": "Message sent successfully"}
 
 @api_router.get("/chat/{user_id}")
@@ -1257,6 +3397,7 @@ async def admin_send_message(message_data: ChatMessageCreate, current_admin: Adm
         message=message_data.message
     )
     await db.chat_messages.insert_one(message.dict())
+    await event_bus.publish("chat.message", message.dict())
     return {"message": "Admin message sent successfully"}
 
 @api_router.get("/admin/chat/conversations")
@@ -1288,9 +3429,254 @@ async def get_all_conversations(current_admin: Admin = Depends(get_current_admin
     
     return enriched_conversations
 
+# Outgoing email goes through the email_outbox collection: requests only enqueue,
+# and EMAIL_WORKERS tasks drain due messages in batches, each over its own reused
+# SMTP connection. Failures retry with exponential backoff and every recipient is
+# paced by a token bucket. Delivery stays off until SMTP_HOST is set; for local
+# testing point it at a stand-in such as ``python -m aiosmtpd -n -l localhost:1025``.
+SMTP_HOST = os.environ.get("SMTP_HOST", "")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "25"))
+SMTP_USERNAME = os.environ.get("SMTP_USERNAME", "")
+SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "false").lower() == "true"
+EMAIL_FROM = os.environ.get("EMAIL_FROM", "quotes@oehtraders.com")
+EMAIL_WORKERS = int(os.environ.get("EMAIL_WORKERS", "4"))
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE", "50"))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_SECONDS = float(os.environ.get("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_POLL_SECONDS = float(os.environ.get("EMAIL_POLL_SECONDS", "10"))
+EMAIL_CLAIM_SECONDS = int(os.environ.get("EMAIL_CLAIM_SECONDS", "300"))
+
+email_recipient_limiter = TokenBucketLimiter(
+    capacity=float(os.environ.get("EMAIL_RECIPIENT_BURST", "5")),
+    refill_per_second=float(os.environ.get("EMAIL_RECIPIENT_PER_HOUR", "20")) / 3600
+)
+
+# Templates are compiled once at import
+QUOTE_EMAIL_SUBJECT = Template("Your OEH Traders quote: $project_name")
+QUOTE_EMAIL_ITEM = Template("  - $quantity x $name ($brand) at $$$price")
+QUOTE_EMAIL_BODY = Template("""Hello $first_name,
+
+Here are the details of your quote request "$project_name" (reference $quote_id).
+
+$items
+
+Status: $status
+Total: $total
+
+$admin_notes
+OEH Traders
+""")
+
+def render_quote_email(quote: dict, user: dict) -> tuple:
+    """Subject and body for a quote email, using the item snapshots on the quote"""
+    items = "\n".join(
+        QUOTE_EMAIL_ITEM.substitute(
+            quantity=item["quantity"],
+            name=item.get("name") or item.get("notes") or item["product_id"],
+            brand=item.get("brand") or "-",
+            price=f"{item['price']:.2f}"
+        )
+        for item in quote["items"]
+    )
+    subject = QUOTE_EMAIL_SUBJECT.substitute(project_name=quote["project_name"])
+    body = QUOTE_EMAIL_BODY.substitute(
+        first_name=user["first_name"],
+        project_name=quote["project_name"],
+        quote_id=quote["id"],
+        items=items,
+        status=quote.get("status", "pending").capitalize(),
+        total=f"${quote.get('total_amount', 0):.2f}",
+        admin_notes=f"Notes from our team:\n{quote['admin_notes']}\n" if quote.get("admin_notes") else ""
+    )
+    return subject, body
+
+def open_smtp_connection() -> smtplib.SMTP:
+    connection = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+    if SMTP_STARTTLS:
+        connection.starttls()
+    if SMTP_USERNAME:
+        connection.login(SMTP_USERNAME, SMTP_PASSWORD)
+    return connection
+
+def close_smtp_connection(connection: smtplib.SMTP):
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+def is_permanent_smtp_failure(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+class EmailOutbox:
+    """Enqueues messages into email_outbox and drains them with a worker pool"""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def enqueue(self, to: str, subject: str, body: str, **metadata) -> str:
+        now = datetime.now(timezone.utc)
+        email_id = str(uuid.uuid4())
+        await db.email_outbox.insert_one({
+            "id": email_id,
+            "to": to,
+            "subject": subject,
+            "body": body,
+            **metadata,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        })
+        self._wake.set()
+        return email_id
+
+    async def start(self):
+        if not SMTP_HOST:
+            logger.info("SMTP_HOST is not set; queued emails will not be delivered")
+            return
+        self._tasks.append(asyncio.create_task(self._dispatch_loop()))
+        self._tasks.extend(asyncio.create_task(self._worker()) for _ in range(EMAIL_WORKERS))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def _claim_batch(self) -> List[dict]:
+        """Claim up to EMAIL_BATCH_SIZE due messages, including claims abandoned by a dead worker"""
+        now = datetime.now(timezone.utc)
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "claimed_until": {"$lt": now}}
+        ]}
+        candidates = await db.email_outbox.find(due, {"_id": 0, "id": 1}).sort("next_attempt_at", 1).limit(EMAIL_BATCH_SIZE).to_list(length=None)
+        if not candidates:
+            return []
+        claim_id = str(uuid.uuid4())
+        await db.email_outbox.update_many(
+            {"$and": [{"id": {"$in": [candidate["id"] for candidate in candidates]}}, due]},
+            {"$set": {"status": "sending", "claim_id": claim_id, "claimed_until": now + timedelta(seconds=EMAIL_CLAIM_SECONDS)}}
+        )
+        return await db.email_outbox.find({"claim_id": claim_id}, {"_id": 0}).to_list(length=None)
+
+    async def _dispatch_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while True:
+                    batch = await self._claim_batch()
+                    for message in batch:
+                        self._queue.put_nowait(message)
+                    await self._queue.join()
+                    if len(batch) < EMAIL_BATCH_SIZE:
+                        break
+            except Exception:
+                logger.exception("Failed to claim queued emails")
+
+    async def _worker(self):
+        connection = None
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(self._queue.get(), timeout=EMAIL_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    # Idle: give the SMTP connection back until the next batch
+                    if connection:
+                        await asyncio.to_thread(close_smtp_connection, connection)
+                        connection = None
+                    continue
+                try:
+                    connection = await self._deliver(message, connection)
+                except Exception:
+                    logger.exception("Failed to record delivery of email %s", message["id"])
+                finally:
+                    self._queue.task_done()
+        finally:
+            if connection:
+                connection.close()
+
+    async def _deliver(self, message: dict, connection: Optional[smtplib.SMTP]) -> Optional[smtplib.SMTP]:
+        """Send one claimed message; returns the connection to reuse for the next one"""
+        retry_after = email_recipient_limiter.consume(message["to"].lower())
+        if retry_after:
+            await self._reschedule(message, retry_after, attempted=False)
+            return connection
+
+        email_message = EmailMessage()
+        email_message["From"] = EMAIL_FROM
+        email_message["To"] = message["to"]
+        email_message["Subject"] = message["subject"]
+        email_message.set_content(message["body"])
+        try:
+            if connection is None:
+                connection = await asyncio.to_thread(open_smtp_connection)
+            await asyncio.to_thread(connection.send_message, email_message)
+        except (smtplib.SMTPException, OSError) as error:
+            if connection is not None:
+                connection.close()
+            attempts = message["attempts"] + 1
+            if attempts >= EMAIL_MAX_ATTEMPTS or is_permanent_smtp_failure(error):
+                await self._fail(message, attempts, error)
+            else:
+                await self._reschedule(message, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), attempted=True, error=error)
+            return None
+
+        now = datetime.now(timezone.utc)
+        await db.email_outbox.update_one(
+            {"id": message["id"]},
+            {"$set": {"status": "sent", "sent_at": now, "attempts": message["attempts"] + 1}, "$unset": {"claim_id": "", "claimed_until": ""}}
+        )
+        if message.get("quote_id"):
+            await db.quotes.update_one({"id": message["quote_id"]}, {"$set": {"email_sent": True, "email_sent_at": now}})
+        self.sent += 1
+        return connection
+
+    async def _reschedule(self, message: dict, delay: float, attempted: bool, error: Optional[Exception] = None):
+        update = {
+            "status": "pending",
+            "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+            "attempts": message["attempts"] + (1 if attempted else 0)
+        }
+        if error:
+            update["last_error"] = str(error)
+            self.retried += 1
+        await db.email_outbox.update_one({"id": message["id"]}, {"$set": update, "$unset": {"claim_id": "", "claimed_until": ""}})
+
+    async def _fail(self, message: dict, attempts: int, error: Exception):
+        logger.warning("Giving up on email %s to %s after %d attempts: %s", message["id"], message["to"], attempts, error)
+        await db.email_outbox.update_one(
+            {"id": message["id"]},
+            {"$set": {"status": "failed", "attempts": attempts, "last_error": str(error)}, "$unset": {"claim_id": "", "claimed_until": ""}}
+        )
+        self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": bool(self._tasks),
+            "in_flight": self._queue.qsize(),
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed
+        }
+
+email_outbox = EmailOutbox()
+
 @api_router.post("/admin/quotes/{quote_id}/send-email")
 async def send_quote_email(quote_id: str, current_admin: Admin = Depends(get_current_admin)):
-    """Send quote details and pricing via email to the user"""
+    """Queue an email with the quote details and pricing for the user"""
     try:
         # Get quote details
         quote = await db.quotes.find_one({"id": quote_id})
@@ -1302,58 +3688,125 @@ async def send_quote_email(quote_id: str, current_admin: Admin = Depends(get_cur
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # For now, we'll just update the quote to mark that email was sent
-        # In a real implementation, you would integrate with an email service like SendGrid
+        # Delivery happens in the email outbox workers; email_sent is set once it goes out
+        subject, body = render_quote_email(quote, user)
+        email_id = await email_outbox.enqueue(user["email"], subject, body, quote_id=quote_id)
         await db.quotes.update_one(
             {"id": quote_id},
             {
                 "$set": {
-                    "email_sent": True,
-                    "email_sent_at": datetime.now(timezone.utc).isoformat(),
+                    "email_id": email_id,
+                    "email_queued_at": datetime.now(timezone.utc),
                     "email_sent_by": current_admin.username
                 }
             }
         )
         
-        return {"message": f"Quote email sent successfully to {user['email']}"}
+        return {"message": f"Quote email queued for delivery to {user['email']}", "email_id": email_id}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to send quote email: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue quote email: {str(e)}")
+
+# Re-reads allowed when a pricing update without ``version`` races another write
+QUOTE_PRICING_ATTEMPTS = 3
+
+def quote_item_price_updates(items: List[dict], item_prices: Union[Dict[str, float], List[float]]) -> tuple:
+    """$set fields and arrayFilters repricing only the named lines of ``items``.
+
+    A dict is keyed by product_id; a list prices lines by position and
+    ignores entries past the end of the quote.
+    """
+    fields: Dict[str, float] = {}
+    array_filters: List[dict] = []
+    if isinstance(item_prices, dict):
+        quoted = {item["product_id"] for item in items}
+        for product_id, price in item_prices.items():
+            if product_id in quoted:
+                name = f"p{len(array_filters)}"
+                fields[f"items.$[{name}].price"] = price
+                array_filters.append({f"{name}.product_id": product_id})
+    else:
+        for index, price in enumerate(item_prices[:len(items)]):
+            fields[f"items.{index}.price"] = price
+    return fields, array_filters
+
+def repriced_quote_total(items: List[dict], item_prices) -> float:
+    """Total of ``items`` after quote_item_price_updates, rounded like CART_TOTAL_EXPR"""
+    if isinstance(item_prices, dict):
+        prices = [item_prices.get(item["product_id"], item["price"]) for item in items]
+    else:
+        prices = [item_prices[i] if i < len(item_prices) else item["price"] for i, item in enumerate(items)]
+    return round(sum(price * item["quantity"] for price, item in zip(prices, items)), 2)
 
 @api_router.put("/admin/quotes/{quote_id}/pricing")
-async def update_quote_pricing(quote_id: str, pricing_data: dict, current_admin: Admin = Depends(get_current_admin)):
-    """Update quote pricing and make it visible to user"""
+async def update_quote_pricing(quote_id: str, pricing_data: QuotePricingUpdate, current_admin: Admin = Depends(get_current_admin)):
+    """Update quote pricing and make it visible to user.
+
+    Only the repriced lines are written, and the total is always computed
+    from the stored items; a ``total_amount`` that disagrees is rejected.
+    The write is a compare-and-set on the quote's version: pass ``version``
+    to get a 409 instead of overwriting another admin's changes.
+    """
     try:
-        # Get quote details
-        quote = await db.quotes.find_one({"id": quote_id})
-        if not quote:
-            raise HTTPException(status_code=404, detail="Quote not found")
-        
-        # Update quote with pricing
-        update_data = {
-            "total_amount": pricing_data.get("total_amount", 0),
-            "admin_notes": pricing_data.get("admin_notes", ""),
-            "pricing_updated_at": datetime.now(timezone.utc).isoformat(),
-            "pricing_updated_by": current_admin.username,
-            "status": "approved"  # Auto-approve when pricing is added
-        }
-        
-        # Update individual item prices if provided
-        if "item_prices" in pricing_data:
-            items = quote.get("items", [])
-            item_prices = pricing_data["item_prices"]
-            for i, item in enumerate(items):
-                if i < len(item_prices):
-                    item["price"] = item_prices[i]
-            update_data["items"] = items
+        item_prices = pricing_data.item_prices or []
+        for _ in range(QUOTE_PRICING_ATTEMPTS):
+            before = await db.quotes.find_one({"id": quote_id}, {"_id": 0})
+            if not before:
+                raise HTTPException(status_code=404, detail="Quote not found")
+            version = before.get("version", 0)
+            if pricing_data.version is not None and pricing_data.version != version:
+                raise HTTPException(status_code=409, detail="Quote was modified by someone else; reload and try again")
+            
+            total_amount = repriced_quote_total(before["items"], item_prices)
+            if pricing_data.total_amount is not None and round(pricing_data.total_amount, 2) != total_amount:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"total_amount {pricing_data.total_amount} does not match the item prices ({total_amount})"
+                )
+            fields, array_filters = quote_item_price_updates(before["items"], item_prices)
+            now = datetime.now(timezone.utc)
+            fields.update({
+                "admin_notes": pricing_data.admin_notes,
+                "pricing_updated_at": now.isoformat(),
+                "pricing_updated_by": current_admin.username,
+                "status": "approved",  # Auto-approve when pricing is added
+                "total_amount": total_amount,
+                "updated_at": now
+            })
+            # Quotes created before versioning have no version field and count as 0
+            result = await db.quotes.update_one(
+                {"id": quote_id, "version": version if version else {"$in": [0, None]}},
+                {"$set": fields, "$inc": {"version": 1}},
+                array_filters=array_filters or None
+            )
+            if result.matched_count:
+                break
+        else:
+            raise HTTPException(status_code=409, detail="Quote was modified by someone else; reload and try again")
         
-        await db.quotes.update_one(
-            {"id": quote_id},
-            {"$set": update_data}
-        )
+        after = {**before, "status": "approved", "total_amount": total_amount}
+        await apply_quote_rollup(before, after)
+        await event_bus.publish("quote.status_changed", {
+            "id": quote_id,
+            "status": "approved",
+            "previous_status": before.get("status"),
+            "total_amount": total_amount
+        })
         
-        return {"message": "Quote pricing updated successfully"}
+        response = {
+            "message": "Quote pricing updated successfully",
+            "total_amount": total_amount,
+            "version": version + 1
+        }
+        if isinstance(pricing_data.item_prices, dict):
+            quoted = {item["product_id"] for item in before["items"]}
+            response["unmatched_product_ids"] = [product_id for product_id in pricing_data.item_prices if product_id not in quoted]
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to update quote pricing: {str(e)}")
 
@@ -1414,7 +3867,8 @@ async def get_products(
     search: Optional[str] = None,
     in_stock: Optional[bool] = None,
     limit: int = Query(default=20, le=100),
-    skip: int = Query(default=0, ge=0)
+    skip: int = Query(default=0, ge=0),
+    current_dealer: Optional[Dealer] = Depends(get_optional_dealer)
 ):
     filter_query = {}
     
@@ -1439,7 +3893,7 @@ async def get_products(
         filter_query["in_stock"] = in_stock
     
     products = await db.products.find(filter_query).skip(skip).limit(limit).to_list(length=None)
-    return [Product(**product) for product in products]
+    return await apply_dealer_pricing([Product(**product) for product in products], current_dealer)
 
 @api_router.get("/categories/with-counts", response_model=List[CategoryWithCount])
 async def get_categories_with_counts():
@@ -1490,32 +3944,83 @@ async def get_price_range():
         return {"min_price": 0, "max_price": 1000}
 
 @api_router.get("/products/featured", response_model=List[Product])
-async def get_featured_products():
+async def get_featured_products(current_dealer: Optional[Dealer] = Depends(get_optional_dealer)):
     products = await db.products.find({"rating": {"$gte": 4.7}}).limit(8).to_list(length=None)
-    return [Product(**product) for product in products]
+    return await apply_dealer_pricing([Product(**product) for product in products], current_dealer)
 
 @api_router.get("/products/trending", response_model=List[Product])
-async def get_trending_products():
+async def get_trending_products(current_dealer: Optional[Dealer] = Depends(get_optional_dealer)):
     products = await db.products.find({"review_count": {"$gte": 100}}).limit(6).to_list(length=None)
-    return [Product(**product) for product in products]
+    return await apply_dealer_pricing([Product(**product) for product in products], current_dealer)
 
 @api_router.get("/products/deals", response_model=List[Product])
-async def get_deals():
+async def get_deals(current_dealer: Optional[Dealer] = Depends(get_optional_dealer)):
     products = await db.products.find({"original_price": {"$exists": True, "$ne": None}}).limit(6).to_list(length=None)
-    return [Product(**product) for product in products]
+    return await apply_dealer_pricing([Product(**product) for product in products], current_dealer)
 
 @api_router.get("/products/new-arrivals", response_model=List[Product])
-async def get_new_arrivals():
+async def get_new_arrivals(current_dealer: Optional[Dealer] = Depends(get_optional_dealer)):
     # Get products sorted by creation date (newest first)
     products = await db.products.find({}).sort("created_at", -1).limit(8).to_list(length=None)
-    return [Product(**product) for product in products]
+    return await apply_dealer_pricing([Product(**product) for product in products], current_dealer)
 
 @api_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str):
+async def get_product(product_id: str, current_dealer: Optional[Dealer] = Depends(get_optional_dealer)):
     product = await db.products.find_one({"id": product_id})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    return Product(**product)
+    priced = await apply_dealer_pricing([Product(**product)], current_dealer)
+    return priced[0]
+
+# Product Review Endpoints
+@api_router.post("/products/{product_id}/reviews", response_model=Review)
+async def create_review(product_id: str, review_data: ReviewCreate, current_user: User = Depends(get_current_user)):
+    product = await db.products.find_one({"id": product_id}, {"_id": 0, "id": 1})
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    review = Review(
+        product_id=product_id,
+        user_id=current_user.id,
+        user_name=f"{current_user.first_name} {current_user.last_name}",
+        rating=review_data.rating,
+        title=review_data.title,
+        comment=review_data.comment
+    )
+
+    # The unique (product_id, user_id) index limits each user to one review per product
+    try:
+        await db.reviews.insert_one(review.dict())
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="You have already reviewed this product")
+
+    # Fold the new rating into the running sum and recompute the average in the same
+    # single-document update, so listings keep reading rating/review_count directly.
+    # Seeded products have no rating_total yet; it is derived from rating * review_count.
+    await db.products.update_one(
+        {"id": product_id},
+        [
+            {"$set": {
+                "rating_total": {"$add": [
+                    {"$ifNull": ["$rating_total", {"$multiply": ["$rating", "$review_count"]}]},
+                    review.rating
+                ]},
+                "review_count": {"$add": ["$review_count", 1]}
+            }},
+            {"$set": {"rating": {"$round": [{"$divide": ["$rating_total", "$review_count"]}, 2]}}}
+        ]
+    )
+
+    return review
+
+@api_router.get("/products/{product_id}/reviews", response_model=List[Review])
+async def get_product_reviews(
+    product_id: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    skip: int = Query(default=0, ge=0)
+):
+    reviews = await db.reviews.find({"product_id": product_id}).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
+    return [Review(**review) for review in reviews]
 
 @api_router.get("/categories", response_model=List[Category])
 async def get_categories():
@@ -1560,6 +4065,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
+    expose_headers=["X-Next-Cursor"],
     allow_headers=["*"],
 )
 
@@ -1570,6 +4076,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def ensure_ttl_index(collection, field: str, seconds: int):
+    """Create a TTL index, or retune it in place when the configured retention changed"""
+    try:
+        await collection.create_index(field, expireAfterSeconds=seconds)
+    except OperationFailure:
+        await db.command("collMod", collection.name, index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds})
+
+@app.on_event("startup")
+async def create_indexes():
+    await db.reviews.create_index([("product_id", 1), ("user_id", 1)], unique=True)
+    await db.reviews.create_index([("product_id", 1), ("created_at", -1)])
+    await db.carts.create_index("user_id", unique=True)
+    await ensure_ttl_index(db.carts, "updated_at", CART_RETENTION_DAYS * 86400)
+    await ensure_ttl_index(db.carts_archive, "archived_at", CART_RETENTION_DAYS * 86400)
+    await db.products.create_index("id", unique=True)
+    await db.quotes.create_index("cart_clear_pending", sparse=True)
+    await db.quotes.create_index([("created_at", -1), ("id", -1)])
+    await db.quotes.create_index([("status", 1), ("created_at", -1), ("id", -1)])
+    await db.quotes.create_index([("user_id", 1), ("created_at", -1), ("id", -1)])
+    await db.users.create_index("id", unique=True)
+    await db.quote_rollups.create_index([("dimension", 1), ("month", 1)])
+    await db.quotes.create_index(
+        [(field, "text") for field in QUOTE_SEARCH_WEIGHTS],
+        weights=QUOTE_SEARCH_WEIGHTS,
+        name="quote_search"
+    )
+    await db.email_outbox.create_index("id", unique=True)
+    await db.email_outbox.create_index([("status", 1), ("next_attempt_at", 1)])
+    await db.email_outbox.create_index("claim_id", sparse=True)
+    await db.api_keys.create_index("key_hash", unique=True)
+    await db.api_keys.create_index("dealer_id")
+    await db.refresh_tokens.create_index("token_hash", unique=True)
+    await db.refresh_tokens.create_index("family_id")
+    await db.refresh_tokens.create_index("expires_at", expireAfterSeconds=0)
+    await db.revoked_tokens.create_index("created_at")
+    await db.revoked_tokens.create_index("expires_at", expireAfterSeconds=0)
+    if LOGIN_RATE_LIMIT_BACKEND == "mongo":
+        await db.login_failures.create_index([("key", 1), ("created_at", -1)])
+        await ensure_ttl_index(db.login_failures, "created_at", LOGIN_FAILURE_WINDOW_SECONDS)
+
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def start_background_tasks():
+    background_tasks.append(asyncio.create_task(revocation_sync_loop()))
+    background_tasks.append(asyncio.create_task(pricing_refresh_loop()))
+    background_tasks.append(asyncio.create_task(cart_compaction_loop()))
+    background_tasks.append(asyncio.create_task(quote_cart_sweep_loop()))
+    background_tasks.append(asyncio.create_task(ensure_quote_rollups()))
+    background_tasks.append(asyncio.create_task(backfill_quote_customers()))
+    await cart_store.start()
+    await email_outbox.start()
+    await event_bus.backend.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task in background_tasks:
+        task.cancel()
+    await cart_store.stop()
+    await email_outbox.stop()
+    await event_bus.backend.stop()
+    client.close()
+    password_executor.shutdown(wait=False)
+    quote_pdf_executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the backend's hot paths.
+
+Runs in-process against backend/server.py without a database, so only the
+CPU-side work (hashing, token handling) is measured.
+
+    python backend_benchmark.py
+"""
+
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# server.py reads these at import time; no connection is opened until a query runs
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+
+import server  # noqa: E402
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> list:
+    """Sample how late the event loop wakes a sleeping task"""
+    lags = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+    return lags
+
+
+async def login_storm(verify, logins: int, stored_hash: str) -> dict:
+    """Run ``logins`` concurrent verifications while sampling event loop lag"""
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify("password123", stored_hash) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    lags = await lag_task
+    assert all(results)
+    return {
+        "logins_per_sec": logins / elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000 if lags else 0.0,
+        "lag_max_ms": max(lags) * 1000 if lags else elapsed * 1000,
+        "lag_samples": len(lags)
+    }
+
+
+async def benchmark_login_storm(logins: int = 64):
+    stored_hash = server.hash_password("password123")
+
+    async def inline_verify(password, hashed):
+        return server.verify_password(password, hashed)
+
+    print(f"Login storm: {logins} concurrent scrypt verifications (n={server.SCRYPT_N}, "
+          f"{server.PASSWORD_HASH_WORKERS} hash workers)")
+    for name, verify in [("inline (blocks loop)", inline_verify), ("thread pool", server.verify_password_async)]:
+        result = await login_storm(verify, logins, stored_hash)
+        print(f"  {name:22s} {result['logins_per_sec']:8.1f} logins/s   "
+              f"loop lag p50 {result['lag_p50_ms']:7.2f} ms   max {result['lag_max_ms']:8.2f} ms   "
+              f"({result['lag_samples']} samples)")
+
+
+async def authenticate(verify, token: str):
+    """Stand-in for an auth dependency: token verification plus the revocation check"""
+    return verify(token)
+
+
+async def auth_load(verify, requests: list, concurrency: int) -> float:
+    """Push ``requests`` through ``concurrency`` worker tasks; returns mean µs per auth"""
+    queue = asyncio.Queue()
+    for token in requests:
+        queue.put_nowait(token)
+
+    async def worker():
+        while not queue.empty():
+            token = queue.get_nowait()
+            assert await authenticate(verify, token) is not None
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return (time.perf_counter() - started) / len(requests) * 1e6
+
+
+async def benchmark_token_verification(clients: int = 200, requests_per_client: int = 100, concurrency: int = 256):
+    tokens = [server.create_jwt_token(f"user-{i}", "user") for i in range(clients)]
+    requests = [token for token in tokens for _ in range(requests_per_client)]
+    random.shuffle(requests)
+
+    def uncached(token):
+        token_data = server.decode_jwt_token(token)
+        if token_data is None or server.revocation_filter.is_revoked(token_data):
+            return None
+        return token_data
+
+    server.token_cache.clear()
+    print(f"Token verification: {clients} clients x {requests_per_client} requests, {concurrency} concurrent tasks")
+    uncached_us = await auth_load(uncached, requests, concurrency)
+    cached_us = await auth_load(server.verify_jwt_token, requests, concurrency)
+    print(f"  uncached {uncached_us:8.2f} µs/request")
+    print(f"  cached   {cached_us:8.2f} µs/request   ({uncached_us / cached_us:.1f}x, "
+          f"hit ratio {server.token_cache.stats()['hit_ratio']:.2%})")
+
+
+async def main():
+    await benchmark_login_storm()
+    await benchmark_token_verification()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
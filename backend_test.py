@@ -36,6 +36,14 @@ class TacticalGearAPITester:
         if details and not success:
             print(f"   Details: {details}")
     
+    def admin_headers(self) -> Dict[str, str]:
+        """Authorization header for the sample admin, logging in on first use"""
+        if not self.admin_token:
+            response = self.session.post(f"{self.base_url}/admin/login", json={"username": "admin", "password": "admin123"})
+            if response.status_code == 200:
+                self.admin_token = response.json().get("access_token")
+        return {"Authorization": f"Bearer {self.admin_token}"} if self.admin_token else {}
+    
     def test_health_check(self):
         """Test the health check endpoint"""
         try:
@@ -984,6 +992,112 @@ class TacticalGearAPITester:
         
         return tests_passed == total_tests
     
+    def test_token_refresh(self):
+        """Test refresh token rotation, reuse detection and logout"""
+        tests_passed = 0
+        total_tests = 0
+        sample_login = {"email": "john.doe@company.com", "password": "password123"}
+        
+        try:
+            first_pair = self.session.post(f"{self.base_url}/users/login", json=sample_login).json()
+        except Exception as e:
+            self.log_test("Token Refresh Setup", False, f"Error: {str(e)}")
+            return False
+        rotated_pair = None
+        
+        # Test 1: A refresh token is exchanged for a working access token and a new refresh token
+        total_tests += 1
+        try:
+            response = self.session.post(f"{self.base_url}/auth/refresh", json={"refresh_token": first_pair["refresh_token"]})
+            if response.status_code == 200:
+                rotated_pair = response.json()
+                profile = self.session.get(f"{self.base_url}/users/profile",
+                                           headers={"Authorization": f"Bearer {rotated_pair['access_token']}"})
+                if rotated_pair["refresh_token"] != first_pair["refresh_token"] and profile.status_code == 200:
+                    self.log_test("Refresh Token Rotation", True, "New token pair issued and accepted")
+                    tests_passed += 1
+                else:
+                    self.log_test("Refresh Token Rotation", False, f"Profile HTTP {profile.status_code}", rotated_pair)
+            else:
+                self.log_test("Refresh Token Rotation", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Refresh Token Rotation", False, f"Error: {str(e)}")
+        
+        # Test 2: Replaying a rotated refresh token revokes the whole family
+        total_tests += 1
+        try:
+            replay = self.session.post(f"{self.base_url}/auth/refresh", json={"refresh_token": first_pair["refresh_token"]})
+            successor = self.session.post(f"{self.base_url}/auth/refresh", json={"refresh_token": (rotated_pair or {}).get("refresh_token", "")})
+            if replay.status_code == 401 and successor.status_code == 401:
+                self.log_test("Refresh Token Reuse Detection", True, "Replayed token rejected and its family revoked")
+                tests_passed += 1
+            else:
+                self.log_test("Refresh Token Reuse Detection", False,
+                              f"Expected 401/401, got {replay.status_code}/{successor.status_code}")
+        except Exception as e:
+            self.log_test("Refresh Token Reuse Detection", False, f"Error: {str(e)}")
+        
+        # Test 3: Logout revokes both the refresh token and the presented access token
+        total_tests += 1
+        try:
+            pair = self.session.post(f"{self.base_url}/users/login", json=sample_login).json()
+            headers = {"Authorization": f"Bearer {pair['access_token']}"}
+            response = self.session.post(f"{self.base_url}/auth/logout", json={"refresh_token": pair["refresh_token"]}, headers=headers)
+            refresh = self.session.post(f"{self.base_url}/auth/refresh", json={"refresh_token": pair["refresh_token"]})
+            profile = self.session.get(f"{self.base_url}/users/profile", headers=headers)
+            if response.status_code == 200 and refresh.status_code == 401 and profile.status_code == 401:
+                self.log_test("Logout Revocation", True, "Refresh and access tokens revoked on logout")
+                tests_passed += 1
+            else:
+                self.log_test("Logout Revocation", False,
+                              f"Logout {response.status_code}, refresh {refresh.status_code}, profile {profile.status_code}")
+        except Exception as e:
+            self.log_test("Logout Revocation", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_login_rate_limit(self):
+        """Test per-account and per-IP login rate limiting (runs last: it drains this client's IP bucket)"""
+        tests_passed = 0
+        total_tests = 0
+        # A fresh address per run keeps the IP bucket separate when the server trusts X-Forwarded-For
+        headers = {"X-Forwarded-For": f"203.0.113.{uuid.uuid4().int % 254 + 1}"}
+        
+        # Test 1: Repeated attempts on one account hit the account bucket with a Retry-After hint
+        total_tests += 1
+        try:
+            login_data = {"email": f"ratelimit.{uuid.uuid4().hex[:8]}@example.com", "password": "wrongpassword"}
+            statuses = [self.session.post(f"{self.base_url}/users/login", json=login_data, headers=headers) for _ in range(6)]
+            last = statuses[-1]
+            retry_after = last.headers.get("Retry-After", "")
+            if [r.status_code for r in statuses[:5]] == [401] * 5 and last.status_code == 429 and retry_after.isdigit() and int(retry_after) > 0:
+                self.log_test("Account Login Rate Limit", True, f"6th attempt rejected with Retry-After {retry_after}s")
+                tests_passed += 1
+            else:
+                self.log_test("Account Login Rate Limit", False,
+                              f"Statuses {[r.status_code for r in statuses]}, Retry-After {retry_after!r}")
+        except Exception as e:
+            self.log_test("Account Login Rate Limit", False, f"Error: {str(e)}")
+        
+        # Test 2: Attempts spread over many accounts still hit the per-IP bucket
+        total_tests += 1
+        try:
+            response = None
+            for attempt in range(25):
+                login_data = {"email": f"ratelimit.{uuid.uuid4().hex[:8]}@example.com", "password": "wrongpassword"}
+                response = self.session.post(f"{self.base_url}/users/login", json=login_data, headers=headers)
+                if response.status_code == 429:
+                    break
+            if response.status_code == 429 and response.headers.get("Retry-After", "").isdigit():
+                self.log_test("IP Login Rate Limit", True, f"Rejected after {attempt + 1} attempts across distinct accounts")
+                tests_passed += 1
+            else:
+                self.log_test("IP Login Rate Limit", False, f"No 429 after 25 attempts, last HTTP {response.status_code}")
+        except Exception as e:
+            self.log_test("IP Login Rate Limit", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
     def test_dealer_authentication_verification(self):
         """Test dealer authentication with sample credentials"""
         tests_passed = 0
@@ -1212,7 +1326,7 @@ class TacticalGearAPITester:
         # Test 3: Admin quote management (get all quotes)
         total_tests += 1
         try:
-            response = self.session.get(f"{self.base_url}/admin/quotes")
+            response = self.session.get(f"{self.base_url}/admin/quotes", headers=self.admin_headers())
             if response.status_code == 200:
                 quotes = response.json()
                 if isinstance(quotes, list) and len(quotes) >= 1:
@@ -1235,7 +1349,7 @@ class TacticalGearAPITester:
                 }
                 
                 response = self.session.put(f"{self.base_url}/admin/quotes/{quote_id}/status", 
-                                          params=update_data)
+                                          params=update_data, headers=self.admin_headers())
                 if response.status_code == 200:
                     data = response.json()
                     if "message" in data and "updated successfully" in data["message"].lower():
@@ -1898,6 +2012,19 @@ class TacticalGearAPITester:
         except Exception as e:
             self.log_test("Admin Endpoint (Admin Token)", False, f"Error: {str(e)}")
         
+        # Test 5: Quote status updates without token (should fail)
+        total_tests += 1
+        try:
+            response = self.session.put(f"{self.base_url}/admin/quotes/any-quote-id/status",
+                                      params={"status": "approved", "admin_notes": "anonymous"})
+            if response.status_code == 401 or response.status_code == 403:
+                self.log_test("Quote Status Update (No Token)", True, "Correctly blocked quote status update without token")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Status Update (No Token)", False, f"Expected 401/403, got HTTP {response.status_code}")
+        except Exception as e:
+            self.log_test("Quote Status Update (No Token)", False, f"Error: {str(e)}")
+        
         return tests_passed == total_tests
     
     def test_enhanced_product_apis(self):
@@ -2059,7 +2186,7 @@ class TacticalGearAPITester:
         # Test 3: Admin can view all quotes with comprehensive user details
         total_tests += 1
         try:
-            response = self.session.get(f"{self.base_url}/admin/quotes")
+            response = self.session.get(f"{self.base_url}/admin/quotes", headers=self.admin_headers())
             if response.status_code == 200:
                 admin_quotes = response.json()
                 if isinstance(admin_quotes, list) and len(admin_quotes) >= 1:
@@ -2096,7 +2223,7 @@ class TacticalGearAPITester:
                     "admin_notes": "Quote approved for processing. Pricing updated with bulk discount."
                 }
                 
-                response = self.session.put(update_url, params=update_params)
+                response = self.session.put(update_url, params=update_params, headers=self.admin_headers())
                 if response.status_code == 200:
                     data = response.json()
                     if "message" in data and "updated successfully" in data["message"].lower():
@@ -2174,7 +2301,7 @@ class TacticalGearAPITester:
                     "admin_notes": "Quote declined due to insufficient information."
                 }
                 
-                decline_response = self.session.put(decline_url, params=decline_params)
+                decline_response = self.session.put(decline_url, params=decline_params, headers=self.admin_headers())
                 if decline_response.status_code == 200:
                     self.log_test("Quote Decline Workflow", True, "Admin successfully declined quote")
                     tests_passed += 1
@@ -2252,7 +2379,7 @@ class TacticalGearAPITester:
         try:
             if quote_id:
                 pricing_data = {
-                    "total_amount": 8750.00,  # Updated total with bulk discount
+                    "total_amount": 7425.00,  # 15 x $275 + 20 x $165 after bulk discount
                     "admin_notes": "Bulk pricing applied: 15% discount for quantities over 10 units. Custom branding included. Training materials package added.",
                     "item_prices": [275.00, 165.00]  # Individual item prices after bulk discount
                 }
@@ -2288,7 +2415,7 @@ class TacticalGearAPITester:
                     
                     if updated_quote:
                         if (updated_quote["status"] == "approved" and 
-                            updated_quote["total_amount"] == 8750.00 and
+                            updated_quote["total_amount"] == 7425.00 and
                             "pricing updated successfully" not in updated_quote.get("admin_notes", "")):
                             self.log_test("Quote Auto-Approval After Pricing", True, f"Quote auto-approved with updated pricing: ${updated_quote['total_amount']}")
                             tests_passed += 1
@@ -2311,8 +2438,8 @@ class TacticalGearAPITester:
                                            headers=admin_headers)
                 if response.status_code == 200:
                     data = response.json()
-                    if "message" in data and "email sent successfully" in data["message"].lower():
-                        self.log_test("Admin Quote Email Sending", True, f"Admin successfully sent quote email")
+                    if "message" in data and "queued for delivery" in data["message"].lower() and data.get("email_id"):
+                        self.log_test("Admin Quote Email Sending", True, f"Admin queued quote email {data['email_id']}")
                         tests_passed += 1
                     else:
                         self.log_test("Admin Quote Email Sending", False, "Unexpected email response", data)
@@ -2581,110 +2708,1198 @@ class TacticalGearAPITester:
         
         return tests_passed == total_tests
     
-    def run_all_tests(self):
-        """Run comprehensive B2B tactical gear backend tests"""
-        print("🚀 Starting Comprehensive B2B Tactical Gear Backend API Tests")
-        print("=" * 80)
-        
-        # Test 1: Health check
-        health_ok = self.test_health_check()
+    def test_product_reviews(self):
+        """Test review submission, pagination and incremental rating aggregates"""
+        tests_passed = 0
+        total_tests = 0
         
-        if not health_ok:
-            print("\n❌ API is not responding. Stopping tests.")
+        if not self.user_token:
+            self.log_test("Product Reviews Setup", False, "No user token available for review testing")
             return False
         
-        # Test 2: Initialize sample data
-        init_ok = self.test_initialize_data()
+        headers = {"Authorization": f"Bearer {self.user_token}"}
         
-        if not init_ok:
-            print("\n❌ Data initialization failed. Stopping tests.")
+        # Get a product to review
+        try:
+            response = self.session.get(f"{self.base_url}/products?limit=1")
+            product = response.json()[0]
+        except Exception as e:
+            self.log_test("Product Reviews Setup", False, f"Error getting product: {str(e)}")
             return False
         
-        # Test 3: Create sample users
-        sample_users_ok = self.test_create_sample_users()
+        # Test 1: Submit a review and verify the aggregates moved by exactly one review
+        total_tests += 1
+        try:
+            review_data = {"rating": 5, "title": "Solid kit", "comment": "Held up well during field training."}
+            response = self.session.post(f"{self.base_url}/products/{product['id']}/reviews", json=review_data, headers=headers)
+            if response.status_code == 200:
+                updated = self.session.get(f"{self.base_url}/products/{product['id']}").json()
+                expected_rating = round((product["rating"] * product["review_count"] + 5) / (product["review_count"] + 1), 2)
+                if updated["review_count"] == product["review_count"] + 1 and abs(updated["rating"] - expected_rating) < 0.01:
+                    self.log_test("Submit Review", True, f"Rating updated to {updated['rating']} over {updated['review_count']} reviews")
+                    tests_passed += 1
+                else:
+                    self.log_test("Submit Review", False, "Aggregates not updated correctly", updated)
+            else:
+                self.log_test("Submit Review", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Submit Review", False, f"Error: {str(e)}")
         
-        if not sample_users_ok:
-            print("\n❌ Sample users creation failed. Stopping tests.")
+        # Test 2: A second review from the same user is rejected
+        total_tests += 1
+        try:
+            response = self.session.post(f"{self.base_url}/products/{product['id']}/reviews",
+                                         json={"rating": 1, "comment": "Duplicate"}, headers=headers)
+            if response.status_code == 400:
+                self.log_test("Duplicate Review", True, "Duplicate review correctly rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Duplicate Review", False, f"Expected 400, got {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Duplicate Review", False, f"Error: {str(e)}")
+        
+        # Test 3: List reviews with pagination
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/products/{product['id']}/reviews?limit=10&skip=0")
+            if response.status_code == 200:
+                reviews = response.json()
+                if isinstance(reviews, list) and len(reviews) == 1 and reviews[0]["rating"] == 5:
+                    self.log_test("List Reviews", True, f"Retrieved {len(reviews)} review(s)")
+                    tests_passed += 1
+                else:
+                    self.log_test("List Reviews", False, "Unexpected reviews list", reviews)
+            else:
+                self.log_test("List Reviews", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("List Reviews", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_dealer_pricing(self):
+        """Test dealer tier pricing on listings and the dealer price list"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.dealer_token:
+            self.log_test("Dealer Pricing Setup", False, "No dealer token available for pricing testing")
             return False
         
-        # Wait a moment for data to be fully initialized
-        time.sleep(3)
+        headers = {"Authorization": f"Bearer {self.dealer_token}"}
         
-        print("\n🔍 Testing Core Product Features...")
-        print("-" * 50)
+        # Test 1: Anonymous listings carry no dealer price
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/products?limit=5")
+            products = response.json()
+            if response.status_code == 200 and all(p.get("dealer_price") is None for p in products):
+                self.log_test("Anonymous Pricing", True, "Anonymous listing shows list prices only")
+                tests_passed += 1
+            else:
+                self.log_test("Anonymous Pricing", False, "Unexpected dealer_price on anonymous listing", products[:1])
+        except Exception as e:
+            self.log_test("Anonymous Pricing", False, f"Error: {str(e)}")
         
-        # Test core product functionality
-        categories_ok = self.test_get_categories()
-        brands_ok = self.test_get_brands()
-        products_ok = self.test_get_products()
-        filtering_ok = self.test_product_filtering()
-        specialized_ok = self.test_specialized_endpoints()
-        individual_ok = self.test_individual_product()
-        enhanced_products_ok = self.test_enhanced_product_apis()
+        # Test 2: Dealer listings carry the tier price (sample dealers are on the 10% standard tier)
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/products?limit=5", headers=headers)
+            products = response.json()
+            if response.status_code == 200 and all(abs(p["dealer_price"] - round(p["price"] * 0.9, 2)) < 0.01 for p in products):
+                self.log_test("Dealer Listing Pricing", True, f"Dealer prices applied to {len(products)} products")
+                tests_passed += 1
+            else:
+                self.log_test("Dealer Listing Pricing", False, "Dealer prices missing or incorrect", products[:1])
+        except Exception as e:
+            self.log_test("Dealer Listing Pricing", False, f"Error: {str(e)}")
         
-        print("\n👤 Testing User Authentication System...")
-        print("-" * 50)
+        # Test 3: Dealer price list covers the catalog
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/dealers/price-list", headers=headers)
+            if response.status_code == 200:
+                data = response.json()
+                if data.get("pricing_tier") == "standard" and len(data.get("prices", [])) >= 10:
+                    self.log_test("Dealer Price List", True, f"Price list with {len(data['prices'])} products retrieved")
+                    tests_passed += 1
+                else:
+                    self.log_test("Dealer Price List", False, "Unexpected price list", data)
+            else:
+                self.log_test("Dealer Price List", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Dealer Price List", False, f"Error: {str(e)}")
         
-        # Test user authentication
-        user_auth_ok = self.test_user_authentication_system()
+        # Test 4: Retail carts get no volume break, and every cart endpoint reports the same total
+        if self.user_token:
+            total_tests += 1
+            try:
+                user_headers = {"Authorization": f"Bearer {self.user_token}"}
+                products = self.session.get(f"{self.base_url}/products?in_stock=true&limit=50").json()
+                product = next(p for p in products if p["stock_quantity"] >= 20)
+                self.session.delete(f"{self.base_url}/cart", headers=user_headers)
+                patched = self.session.patch(f"{self.base_url}/cart/items/{product['id']}", json={"quantity": 20}, headers=user_headers).json()["cart"]
+                fetched = self.session.get(f"{self.base_url}/cart", headers=user_headers).json()
+                expected_total = round(product["price"] * 20, 2)
+                if abs(patched["total"] - expected_total) < 0.01 and abs(fetched["total"] - patched["total"]) < 0.01:
+                    self.log_test("Retail Volume Pricing", True, f"20 units priced at list (${expected_total}) on every cart endpoint")
+                    tests_passed += 1
+                else:
+                    self.log_test("Retail Volume Pricing", False, f"Expected ${expected_total}, got {patched['total']} / {fetched['total']}")
+                self.session.delete(f"{self.base_url}/cart", headers=user_headers)
+            except Exception as e:
+                self.log_test("Retail Volume Pricing", False, f"Error: {str(e)}")
         
-        print("\n🏢 Testing Dealer Authentication System...")
-        print("-" * 50)
+        return tests_passed == total_tests
+    
+    def test_dealer_api_keys(self):
+        """Test scoped dealer API keys for machine-to-machine catalog and pricing access"""
+        tests_passed = 0
+        total_tests = 0
         
-        # Test dealer authentication
-        dealer_auth_ok = self.test_dealer_authentication_verification()
+        if not self.dealer_token:
+            self.log_test("Dealer API Keys Setup", False, "No dealer token available for API key testing")
+            return False
         
-        print("\n🛒 Testing Enhanced Cart System...")
-        print("-" * 50)
+        headers = {"Authorization": f"Bearer {self.dealer_token}"}
+        api_key = None
+        key_id = None
         
-        # Test user-based cart system
-        cart_ok = self.test_enhanced_cart_system()
+        # Test 1: Create an API key
+        total_tests += 1
+        try:
+            response = self.session.post(f"{self.base_url}/dealers/api-keys",
+                                         json={"name": "ERP Sync", "scopes": ["catalog:read", "pricing:read"]}, headers=headers)
+            if response.status_code == 200:
+                data = response.json()
+                api_key = data.get("api_key")
+                key_id = data.get("id")
+                if api_key and api_key.startswith(data.get("prefix", "-")):
+                    self.log_test("Create API Key", True, f"API key created with prefix {data['prefix']}")
+                    tests_passed += 1
+                else:
+                    self.log_test("Create API Key", False, "Unexpected API key response", data)
+            else:
+                self.log_test("Create API Key", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Create API Key", False, f"Error: {str(e)}")
         
-        print("\n💼 Testing Quote System...")
-        print("-" * 50)
+        # Test 2: Use the API key for the price list
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/dealers/price-list", headers={"X-API-Key": api_key or ""})
+            if response.status_code == 200 and response.json().get("prices"):
+                self.log_test("API Key Price List", True, "Price list retrieved with API key")
+                tests_passed += 1
+            else:
+                self.log_test("API Key Price List", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("API Key Price List", False, f"Error: {str(e)}")
         
-        # Test quote system
-        quote_ok = self.test_quote_system()
+        # Test 3: Catalog endpoints require catalog:read, and only price with pricing:read
+        total_tests += 1
+        try:
+            key_data = self.session.post(f"{self.base_url}/dealers/api-keys",
+                                         json={"name": "Catalog Feed", "scopes": ["pricing:read"]}, headers=headers).json()
+            catalog_key = self.session.post(f"{self.base_url}/dealers/api-keys",
+                                            json={"name": "Catalog Only", "scopes": ["catalog:read"]}, headers=headers).json()
+            no_catalog = self.session.get(f"{self.base_url}/products?limit=5", headers={"X-API-Key": key_data["api_key"]})
+            catalog_only = self.session.get(f"{self.base_url}/products?limit=5", headers={"X-API-Key": catalog_key["api_key"]})
+            full_scope = self.session.get(f"{self.base_url}/products?limit=5", headers={"X-API-Key": api_key or ""})
+            if (no_catalog.status_code == 401 and catalog_only.status_code == 200
+                    and all(p.get("dealer_price") is None for p in catalog_only.json())
+                    and full_scope.status_code == 200 and all(p.get("dealer_price") is not None for p in full_scope.json())):
+                self.log_test("API Key Catalog Scope", True, "catalog:read enforced and pricing:read gates dealer prices")
+                tests_passed += 1
+            else:
+                self.log_test("API Key Catalog Scope", False,
+                              f"HTTP {no_catalog.status_code}/{catalog_only.status_code}/{full_scope.status_code}")
+            for key in (key_data, catalog_key):
+                self.session.delete(f"{self.base_url}/dealers/api-keys/{key['id']}", headers=headers)
+        except Exception as e:
+            self.log_test("API Key Catalog Scope", False, f"Error: {str(e)}")
         
-        print("\n💼 Testing Enhanced Quote System...")
-        print("-" * 50)
+        # Test 4: Revoked keys are rejected, on the catalog as well as the price list
+        total_tests += 1
+        try:
+            self.session.delete(f"{self.base_url}/dealers/api-keys/{key_id}", headers=headers)
+            response = self.session.get(f"{self.base_url}/dealers/price-list", headers={"X-API-Key": api_key or ""})
+            catalog = self.session.get(f"{self.base_url}/products?limit=5", headers={"X-API-Key": api_key or ""})
+            if response.status_code == 401 and catalog.status_code == 401:
+                self.log_test("Revoked API Key", True, "Revoked API key correctly rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Revoked API Key", False, f"Expected 401, got {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Revoked API Key", False, f"Error: {str(e)}")
         
-        # Test enhanced quote system with comprehensive data model
-        enhanced_quote_ok = self.test_enhanced_quote_system()
+        return tests_passed == total_tests
+    
+    def test_bulk_cart_operations(self):
+        """Test batch add, set quantity and clear on the cart"""
+        tests_passed = 0
+        total_tests = 0
         
-        print("\n💬 Testing Chat System...")
-        print("-" * 50)
+        if not self.user_token:
+            self.log_test("Bulk Cart Setup", False, "No user token available for bulk cart testing")
+            return False
         
-        # Test chat system
-        chat_ok = self.test_chat_system()
+        headers = {"Authorization": f"Bearer {self.user_token}"}
         
-        print("\n🔧 Testing Enhanced Filtering...")
-        print("-" * 50)
+        try:
+            products = self.session.get(f"{self.base_url}/products?in_stock=true&limit=3").json()
+            product_ids = [p["id"] for p in products]
+            self.session.delete(f"{self.base_url}/cart", headers=headers)
+        except Exception as e:
+            self.log_test("Bulk Cart Setup", False, f"Error getting products: {str(e)}")
+            return False
         
-        # Test enhanced filtering
-        enhanced_filtering_ok = self.test_enhanced_filtering()
+        # Test 1: Batch add with a duplicated product id merges into one line
+        total_tests += 1
+        try:
+            batch = {"items": [{"product_id": pid, "quantity": 1} for pid in product_ids] + [{"product_id": product_ids[0], "quantity": 2}]}
+            response = self.session.post(f"{self.base_url}/cart/items:batch", json=batch, headers=headers)
+            if response.status_code == 200:
+                cart = response.json()["cart"]
+                quantities = {item["product_id"]: item["quantity"] for item in cart["items"]}
+                if len(cart["items"]) == len(product_ids) and quantities[product_ids[0]] == 3:
+                    self.log_test("Batch Add To Cart", True, f"Added {len(product_ids)} lines in one request")
+                    tests_passed += 1
+                else:
+                    self.log_test("Batch Add To Cart", False, "Unexpected cart lines", cart)
+            else:
+                self.log_test("Batch Add To Cart", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Batch Add To Cart", False, f"Error: {str(e)}")
         
-        print("\n🔑 Testing Admin Panel System...")
-        print("-" * 50)
+        # Test 2: Batch with an unknown product is rejected without partial writes
+        total_tests += 1
+        try:
+            batch = {"items": [{"product_id": product_ids[1], "quantity": 1}, {"product_id": "non-existent-product", "quantity": 1}]}
+            response = self.session.post(f"{self.base_url}/cart/items:batch", json=batch, headers=headers)
+            cart = self.session.get(f"{self.base_url}/cart", headers=headers).json()
+            quantities = {item["product_id"]: item["quantity"] for item in cart["items"]}
+            if response.status_code == 404 and quantities.get(product_ids[1]) == 1:
+                self.log_test("Batch Validation", True, "Unknown product rejected, cart unchanged")
+                tests_passed += 1
+            else:
+                self.log_test("Batch Validation", False, f"HTTP {response.status_code}", quantities)
+        except Exception as e:
+            self.log_test("Batch Validation", False, f"Error: {str(e)}")
         
-        # Test admin authentication and management
-        admin_auth_ok = self.test_admin_authentication_system()
-        admin_management_ok = self.test_admin_management_endpoints()
-        admin_dealer_mgmt_ok = self.test_admin_dealer_management()
-        admin_quote_mgmt_ok = self.test_admin_quote_management()
-        admin_authorization_ok = self.test_admin_authorization()
+        # Test 3: Set a line quantity and recompute the total
+        total_tests += 1
+        try:
+            response = self.session.patch(f"{self.base_url}/cart/items/{product_ids[0]}", json={"quantity": 5}, headers=headers)
+            if response.status_code == 200:
+                cart = response.json()["cart"]
+                line = next(item for item in cart["items"] if item["product_id"] == product_ids[0])
+                expected_total = round(sum(item["quantity"] * item["price"] for item in cart["items"]), 2)
+                if line["quantity"] == 5 and abs(cart["total"] - expected_total) < 0.01:
+                    self.log_test("Set Cart Quantity", True, "Quantity set and total recomputed server-side")
+                    tests_passed += 1
+                else:
+                    self.log_test("Set Cart Quantity", False, "Unexpected cart after update", cart)
+            else:
+                self.log_test("Set Cart Quantity", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Set Cart Quantity", False, f"Error: {str(e)}")
         
-        print("\n💰 Testing Enhanced Quote Pricing System...")
-        print("-" * 50)
+        # Test 4: Clear the cart
+        total_tests += 1
+        try:
+            response = self.session.delete(f"{self.base_url}/cart", headers=headers)
+            cart = self.session.get(f"{self.base_url}/cart", headers=headers).json()
+            if response.status_code == 200 and cart["items"] == [] and cart["total"] == 0:
+                self.log_test("Clear Cart", True, "Cart cleared")
+                tests_passed += 1
+            else:
+                self.log_test("Clear Cart", False, f"HTTP {response.status_code}", cart)
+        except Exception as e:
+            self.log_test("Clear Cart", False, f"Error: {str(e)}")
         
-        # Test enhanced quote-based pricing system with email and pricing endpoints
-        enhanced_quote_pricing_ok = self.test_enhanced_quote_pricing_system()
+        return tests_passed == total_tests
+    
+    def test_guest_cart(self):
+        """Test guest carts and merging them into the user's cart on login"""
+        tests_passed = 0
+        total_tests = 0
         
-        print("\n💬 Testing Admin Chat System...")
-        print("-" * 50)
+        try:
+            products = self.session.get(f"{self.base_url}/products?in_stock=true&limit=2").json()
+            product_ids = [p["id"] for p in products]
+            guest_session = self.session.post(f"{self.base_url}/guest/session").json()["guest_session"]
+            guest_headers = {"X-Guest-Session": guest_session}
+        except Exception as e:
+            self.log_test("Guest Cart Setup", False, f"Error: {str(e)}")
+            return False
         
-        # Test admin chat system functionality
-        admin_chat_ok = self.test_admin_chat_system()
+        # Test 1: Guest can build a cart without logging in
+        total_tests += 1
+        try:
+            batch = {"items": [{"product_id": pid, "quantity": 2} for pid in product_ids]}
+            response = self.session.post(f"{self.base_url}/cart/items:batch", json=batch, headers=guest_headers)
+            if response.status_code == 200 and len(response.json()["cart"]["items"]) == len(product_ids):
+                self.log_test("Guest Cart", True, f"Guest added {len(product_ids)} lines")
+                tests_passed += 1
+            else:
+                self.log_test("Guest Cart", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Guest Cart", False, f"Error: {str(e)}")
+        
+        # Test 2: Tampered guest session is rejected
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/cart", headers={"X-Guest-Session": guest_session + "0"})
+            if response.status_code == 401:
+                self.log_test("Guest Session Signature", True, "Tampered session rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Guest Session Signature", False, f"Expected 401, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Guest Session Signature", False, f"Error: {str(e)}")
+        
+        # Test 3: Logging in merges the guest cart into the user's cart
+        total_tests += 1
+        try:
+            login = {"email": "john.doe@company.com", "password": "password123"}
+            response = self.session.post(f"{self.base_url}/users/login", json=login, headers=guest_headers)
+            if response.status_code == 200:
+                headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+                cart = self.session.get(f"{self.base_url}/cart", headers=headers).json()
+                guest_cart = self.session.get(f"{self.base_url}/cart", headers=guest_headers).json()
+                merged = {item["product_id"] for item in cart["items"]}
+                if set(product_ids) <= merged and guest_cart["items"] == []:
+                    self.log_test("Guest Cart Merge", True, "Guest lines moved to the user's cart")
+                    tests_passed += 1
+                else:
+                    self.log_test("Guest Cart Merge", False, "Guest lines not merged", cart)
+                self.session.delete(f"{self.base_url}/cart", headers=headers)
+            else:
+                self.log_test("Guest Cart Merge", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Guest Cart Merge", False, f"Error: {str(e)}")
+        
+        # Test 4: Extending the signed expiry invalidates the session
+        total_tests += 1
+        try:
+            session_id, exp, signature = guest_session.split(".")
+            extended = f"{session_id}.{int(exp) + 86400}.{signature}"
+            response = self.session.get(f"{self.base_url}/cart", headers={"X-Guest-Session": extended})
+            if response.status_code == 401:
+                self.log_test("Guest Session Expiry", True, "Session with an altered expiry rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Guest Session Expiry", False, f"Expected 401, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Guest Session Expiry", False, f"Error: {str(e)}")
+        
+        # Test 5: Concurrent logins with one guest session merge its lines once
+        total_tests += 1
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+            login = {"email": "john.doe@company.com", "password": "password123"}
+            racing_headers = {"X-Guest-Session": self.session.post(f"{self.base_url}/guest/session").json()["guest_session"]}
+            self.session.post(f"{self.base_url}/cart/add", json={"product_id": product_ids[0], "quantity": 1}, headers=racing_headers)
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                logins = list(pool.map(lambda _: requests.post(f"{self.base_url}/users/login", json=login, headers=racing_headers), range(2)))
+            headers = {"Authorization": f"Bearer {logins[0].json()['access_token']}"}
+            cart = self.session.get(f"{self.base_url}/cart", headers=headers).json()
+            quantity = sum(item["quantity"] for item in cart["items"] if item["product_id"] == product_ids[0])
+            if all(r.status_code == 200 for r in logins) and quantity == 1:
+                self.log_test("Guest Cart Concurrent Merge", True, "Guest line merged exactly once")
+                tests_passed += 1
+            else:
+                self.log_test("Guest Cart Concurrent Merge", False, f"Logins {[r.status_code for r in logins]}, quantity {quantity}")
+            self.session.delete(f"{self.base_url}/cart", headers=headers)
+        except Exception as e:
+            self.log_test("Guest Cart Concurrent Merge", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_cart_compaction(self):
+        """Test the admin cart compaction run and that repeated runs stay healthy"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.admin_token:
+            self.log_test("Cart Compaction Setup", False, "No admin token available for compaction testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        
+        # Test 1: Back-to-back runs both succeed, so carts already in the archive never wedge compaction
+        total_tests += 1
+        try:
+            runs = [self.session.post(f"{self.base_url}/admin/carts/compact", headers=headers) for _ in range(2)]
+            if all(run.status_code == 200 and "carts_reclaimed" in run.json() for run in runs):
+                self.log_test("Cart Compaction", True, f"Reclaimed {runs[0].json()['carts_reclaimed']} then {runs[1].json()['carts_reclaimed']} carts")
+                tests_passed += 1
+            else:
+                self.log_test("Cart Compaction", False, f"HTTP {[run.status_code for run in runs]}", runs[-1].text)
+        except Exception as e:
+            self.log_test("Cart Compaction", False, f"Error: {str(e)}")
+        
+        # Test 2: Compaction is admin-only
+        total_tests += 1
+        try:
+            response = self.session.post(f"{self.base_url}/admin/carts/compact")
+            if response.status_code in [401, 403]:
+                self.log_test("Cart Compaction Authorization", True, "Anonymous compaction rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Cart Compaction Authorization", False, f"Expected 401/403, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Cart Compaction Authorization", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_quote_cart_clearing(self):
+        """Test that quote submission clears the cart and the sweep leaves newer carts alone"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.user_token or not self.admin_token:
+            self.log_test("Quote Cart Clearing Setup", False, "User and admin tokens required for cart clearing testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        admin_headers = {"Authorization": f"Bearer {self.admin_token}"}
+        try:
+            product = self.session.get(f"{self.base_url}/products?in_stock=true&limit=1").json()[0]
+            quote_data = {
+                "user_id": self.test_user_id or "",
+                "items": [{"product_id": product["id"], "quantity": 1, "price": 0}],
+                "project_name": "Cart Clearing Check",
+                "intended_use": "training",
+                "delivery_address": "1 Test Street",
+                "billing_address": "1 Test Street"
+            }
+        except Exception as e:
+            self.log_test("Quote Cart Clearing Setup", False, f"Error: {str(e)}")
+            return False
+        
+        # Test 1: Submitting a quote empties the cart
+        total_tests += 1
+        try:
+            self.session.post(f"{self.base_url}/cart/add", json={"product_id": product["id"], "quantity": 1}, headers=headers)
+            response = self.session.post(f"{self.base_url}/quotes", json=quote_data, headers=headers)
+            cart = self.session.get(f"{self.base_url}/cart", headers=headers).json()
+            if response.status_code == 200 and not cart["items"]:
+                self.log_test("Quote Clears Cart", True, "Cart emptied on quote submission")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Clears Cart", False, f"HTTP {response.status_code}, {len(cart['items'])} items left")
+        except Exception as e:
+            self.log_test("Quote Clears Cart", False, f"Error: {str(e)}")
+        
+        # Test 2: The sweep runs and keeps a cart filled after the quote was submitted
+        total_tests += 1
+        try:
+            self.session.post(f"{self.base_url}/cart/add", json={"product_id": product["id"], "quantity": 1}, headers=headers)
+            response = self.session.post(f"{self.base_url}/admin/quotes/sweep-carts", headers=admin_headers)
+            cart = self.session.get(f"{self.base_url}/cart", headers=headers).json()
+            if response.status_code == 200 and "quotes_settled" in response.json() and cart["items"]:
+                self.log_test("Quote Cart Sweep", True, f"Sweep settled {response.json()['quotes_settled']} quotes, newer cart kept")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Cart Sweep", False, f"HTTP {response.status_code}, {len(cart['items'])} items in cart")
+            self.session.delete(f"{self.base_url}/cart", headers=headers)
+        except Exception as e:
+            self.log_test("Quote Cart Sweep", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_admin_quote_pagination(self):
+        """Test keyset pagination and filters on the admin quote listing"""
+        tests_passed = 0
+        total_tests = 0
+        headers = self.admin_headers()
+        
+        # Test 1: Walking pages by cursor returns each quote once
+        total_tests += 1
+        try:
+            seen = []
+            cursor = None
+            while True:
+                params = {"limit": 2}
+                if cursor:
+                    params["cursor"] = cursor
+                response = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params=params)
+                if response.status_code != 200:
+                    break
+                page = response.json()
+                seen.extend(quote["id"] for quote in page)
+                cursor = response.headers.get("X-Next-Cursor")
+                if not cursor:
+                    break
+            all_quotes = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 500}).json()
+            if response.status_code == 200 and seen == [quote["id"] for quote in all_quotes]:
+                self.log_test("Admin Quote Pagination", True, f"Walked {len(seen)} quotes in pages of 2")
+                tests_passed += 1
+            else:
+                self.log_test("Admin Quote Pagination", False, f"HTTP {response.status_code}", seen)
+        except Exception as e:
+            self.log_test("Admin Quote Pagination", False, f"Error: {str(e)}")
+        
+        # Test 2: Status filter only returns matching quotes
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"status": "pending"})
+            quotes = response.json()
+            if response.status_code == 200 and all(quote["status"] == "pending" for quote in quotes):
+                self.log_test("Admin Quote Status Filter", True, f"{len(quotes)} pending quotes")
+                tests_passed += 1
+            else:
+                self.log_test("Admin Quote Status Filter", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Admin Quote Status Filter", False, f"Error: {str(e)}")
+        
+        # Test 3: Malformed cursor is rejected
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"cursor": "not-a-cursor"})
+            if response.status_code == 400:
+                self.log_test("Admin Quote Cursor Validation", True, "Malformed cursor rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Admin Quote Cursor Validation", False, f"Expected 400, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Admin Quote Cursor Validation", False, f"Error: {str(e)}")
+        
+        # Test 4: The listing carries customer details, so it is admin-only
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/quotes")
+            if response.status_code in [401, 403]:
+                self.log_test("Admin Quote Listing Authorization", True, "Anonymous listing rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Admin Quote Listing Authorization", False, f"Expected 401/403, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Admin Quote Listing Authorization", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_user_quote_history(self):
+        """Test the paginated quote summary view and quote detail endpoint"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.user_token:
+            self.log_test("Quote History Setup", False, "No user token available for quote history testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        summaries = []
+        
+        # Test 1: Summary view leaves out items
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/quotes", params={"view": "summary", "limit": 5}, headers=headers)
+            if response.status_code == 200:
+                summaries = response.json()
+                if len(summaries) <= 5 and all("items" not in quote and "item_count" in quote for quote in summaries):
+                    self.log_test("Quote Summary View", True, f"Retrieved {len(summaries)} quote summaries")
+                    tests_passed += 1
+                else:
+                    self.log_test("Quote Summary View", False, "Unexpected summary shape", summaries)
+            else:
+                self.log_test("Quote Summary View", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Quote Summary View", False, f"Error: {str(e)}")
+        
+        # Test 2: Detail endpoint returns the full quote
+        total_tests += 1
+        try:
+            if summaries:
+                summary = summaries[0]
+                response = self.session.get(f"{self.base_url}/quotes/{summary['id']}", headers=headers)
+                quote = response.json()
+                if response.status_code == 200 and len(quote["items"]) == summary["item_count"]:
+                    self.log_test("Quote Detail", True, f"Quote {summary['id']} has {len(quote['items'])} items")
+                    tests_passed += 1
+                else:
+                    self.log_test("Quote Detail", False, f"HTTP {response.status_code}", quote)
+            else:
+                self.log_test("Quote Detail", False, "No quotes available for detail testing")
+        except Exception as e:
+            self.log_test("Quote Detail", False, f"Error: {str(e)}")
+        
+        # Test 3: Unknown quote id returns 404
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/quotes/non-existent-quote", headers=headers)
+            if response.status_code == 404:
+                self.log_test("Quote Detail Not Found", True, "Unknown quote returns 404")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Detail Not Found", False, f"Expected 404, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Quote Detail Not Found", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_quote_item_snapshots(self):
+        """Test that submitted quote items carry a snapshot of the product"""
+        if not self.user_token:
+            self.log_test("Quote Item Snapshots", False, "No user token available for snapshot testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        try:
+            product = self.session.get(f"{self.base_url}/products?limit=1").json()[0]
+            quote_data = {
+                "user_id": self.test_user_id or "",
+                "items": [{"product_id": product["id"], "quantity": 1, "price": 0, "name": "Client supplied name"}],
+                "project_name": "Snapshot Check",
+                "intended_use": "training",
+                "delivery_address": "1 Test Street",
+                "billing_address": "1 Test Street"
+            }
+            response = self.session.post(f"{self.base_url}/quotes", json=quote_data, headers=headers)
+            if response.status_code != 200:
+                self.log_test("Quote Item Snapshots", False, f"HTTP {response.status_code}", response.text)
+                return False
+            
+            quote = self.session.get(f"{self.base_url}/quotes/{response.json()['quote_id']}", headers=headers).json()
+            item = quote["items"][0]
+            if item["name"] == product["name"] and item["brand"] == product["brand"] and item["image_url"] == product["image_url"]:
+                self.log_test("Quote Item Snapshots", True, f"Quote item carries snapshot of {product['name']}")
+                return True
+            self.log_test("Quote Item Snapshots", False, "Snapshot does not match product", item)
+            return False
+        except Exception as e:
+            self.log_test("Quote Item Snapshots", False, f"Error: {str(e)}")
+            return False
+    
+    def test_quote_pdf(self):
+        """Test quote PDF download and caching"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.user_token:
+            self.log_test("Quote PDF Setup", False, "No user token available for quote PDF testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.user_token}"}
+        
+        # Test 1: Download renders a PDF and repeat downloads return the cached file
+        total_tests += 1
+        try:
+            quotes = self.session.get(f"{self.base_url}/quotes", params={"view": "summary", "limit": 1}, headers=headers).json()
+            if quotes:
+                first = self.session.get(f"{self.base_url}/quotes/{quotes[0]['id']}/pdf", headers=headers)
+                second = self.session.get(f"{self.base_url}/quotes/{quotes[0]['id']}/pdf", headers=headers)
+                if (first.status_code == 200 and first.headers.get("content-type") == "application/pdf"
+                        and first.content.startswith(b"%PDF") and first.content == second.content):
+                    self.log_test("Quote PDF Download", True, f"Downloaded {len(first.content)} byte PDF twice")
+                    tests_passed += 1
+                else:
+                    self.log_test("Quote PDF Download", False, f"HTTP {first.status_code}/{second.status_code}", first.headers.get("content-type"))
+            else:
+                self.log_test("Quote PDF Download", False, "No quotes available for PDF testing")
+        except Exception as e:
+            self.log_test("Quote PDF Download", False, f"Error: {str(e)}")
+        
+        # Test 2: Unknown quote returns 404
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/quotes/non-existent-quote/pdf", headers=headers)
+            if response.status_code == 404:
+                self.log_test("Quote PDF Not Found", True, "Unknown quote returns 404")
+                tests_passed += 1
+            else:
+                self.log_test("Quote PDF Not Found", False, f"Expected 404, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Quote PDF Not Found", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_quote_analytics(self):
+        """Test the pre-aggregated quote analytics endpoint"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.admin_token:
+            self.log_test("Quote Analytics Setup", False, "No admin token available for analytics testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        
+        # Test 1: Rebuilt rollups agree with the quotes collection
+        total_tests += 1
+        try:
+            self.session.post(f"{self.base_url}/admin/analytics/quotes/rebuild", headers=headers)
+            response = self.session.get(f"{self.base_url}/admin/analytics/quotes", params={"dimension": "status"}, headers=headers)
+            if response.status_code == 200:
+                data = response.json()
+                quotes = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 500}).json()
+                counted = sum(bucket["count"] for bucket in data["buckets"])
+                if data["dimension"] == "status" and counted >= len(quotes):
+                    self.log_test("Quote Analytics", True, f"{counted} quotes across {len(data['buckets'])} monthly buckets")
+                    tests_passed += 1
+                else:
+                    self.log_test("Quote Analytics", False, f"Rollups count {counted} quotes, listing has {len(quotes)}")
+            else:
+                self.log_test("Quote Analytics", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Quote Analytics", False, f"Error: {str(e)}")
+        
+        # Test 2: Status changes move quotes between status buckets
+        total_tests += 1
+        try:
+            quote = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 1}).json()[0]
+            month = quote["created_at"][:7]
+            
+            def status_counts():
+                data = self.session.get(f"{self.base_url}/admin/analytics/quotes",
+                                        params={"dimension": "status", "from_month": month, "to_month": month}, headers=headers).json()
+                values = data["buckets"][0]["values"] if data["buckets"] else {}
+                return {value: cell["count"] for value, cell in values.items()}
+            
+            before = status_counts()
+            new_status = "reviewed" if quote["status"] != "reviewed" else "declined"
+            self.session.put(f"{self.base_url}/admin/quotes/{quote['id']}/status", params={"status": new_status}, headers=headers)
+            after = status_counts()
+            self.session.put(f"{self.base_url}/admin/quotes/{quote['id']}/status",
+                             params={"status": quote["status"], "admin_notes": quote.get("admin_notes") or ""}, headers=headers)
+            if (after.get(new_status, 0) == before.get(new_status, 0) + 1
+                    and after.get(quote["status"], 0) == before.get(quote["status"], 0) - 1):
+                self.log_test("Quote Analytics Incremental", True, f"Quote moved from {quote['status']} to {new_status}")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Analytics Incremental", False, "Rollups did not follow the status change", {"before": before, "after": after})
+        except Exception as e:
+            self.log_test("Quote Analytics Incremental", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_admin_quote_search(self):
+        """Test ranked admin quote search"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.admin_token:
+            self.log_test("Quote Search Setup", False, "No admin token available for quote search testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        
+        # Test 1: Searching a project name ranks that quote first
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/quotes/search", params={"q": "Precision Equipment Procurement"}, headers=headers)
+            if response.status_code == 200:
+                hits = response.json()
+                if hits and hits[0]["project_name"] == "Precision Equipment Procurement" and "score" in hits[0]:
+                    self.log_test("Admin Quote Search", True, f"{len(hits)} hits, top score {hits[0]['score']:.2f}")
+                    tests_passed += 1
+                else:
+                    self.log_test("Admin Quote Search", False, "Expected project to rank first", hits[:3])
+            else:
+                self.log_test("Admin Quote Search", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Admin Quote Search", False, f"Error: {str(e)}")
+        
+        # Test 2: Company names from the customer snapshot are searchable
+        total_tests += 1
+        try:
+            quote = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 1}).json()[0]
+            if quote.get("company_name"):
+                response = self.session.get(f"{self.base_url}/admin/quotes/search", params={"q": quote["company_name"], "limit": 100}, headers=headers)
+                if response.status_code == 200 and quote["id"] in [hit["id"] for hit in response.json()]:
+                    self.log_test("Admin Quote Search By Company", True, f"Found quote by company {quote['company_name']}")
+                    tests_passed += 1
+                else:
+                    self.log_test("Admin Quote Search By Company", False, f"HTTP {response.status_code}", response.text[:200])
+            else:
+                self.log_test("Admin Quote Search By Company", True, "Latest quote has no company name to search")
+                tests_passed += 1
+        except Exception as e:
+            self.log_test("Admin Quote Search By Company", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_admin_event_stream(self):
+        """Test the admin Server-Sent Events stream"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.admin_token:
+            self.log_test("Admin Events Setup", False, "No admin token available for event stream testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        
+        # Test 1: Stream requires an admin token
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/events", timeout=10)
+            if response.status_code == 401:
+                self.log_test("Admin Events Auth", True, "Stream rejected without a token")
+                tests_passed += 1
+            else:
+                self.log_test("Admin Events Auth", False, f"Expected 401, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Admin Events Auth", False, f"Error: {str(e)}")
+        
+        # Test 2: A quote status change is pushed to an open stream
+        total_tests += 1
+        try:
+            quote = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 1}).json()[0]
+            with requests.get(f"{self.base_url}/admin/events", params={"token": self.admin_token}, stream=True, timeout=15) as stream:
+                lines = stream.iter_lines(decode_unicode=True)
+                next(lines)  # retry hint
+                self.session.put(f"{self.base_url}/admin/quotes/{quote['id']}/status",
+                                 params={"status": quote["status"], "admin_notes": quote.get("admin_notes") or ""}, headers=headers)
+                event_type = None
+                for line in lines:
+                    if line.startswith("event: "):
+                        event_type = line[len("event: "):]
+                    elif line.startswith("data: ") and event_type == "quote.status_changed":
+                        if json.loads(line[len("data: "):])["id"] == quote["id"]:
+                            break
+                else:
+                    event_type = None
+            if event_type == "quote.status_changed":
+                self.log_test("Admin Events Push", True, f"Received status change for quote {quote['id']}")
+                tests_passed += 1
+            else:
+                self.log_test("Admin Events Push", False, "Stream closed without the status change event")
+        except Exception as e:
+            self.log_test("Admin Events Push", False, f"Error: {str(e)}")
+        
+        # Test 3: Revoking the token closes an open stream by the next heartbeat
+        total_tests += 1
+        try:
+            pair = self.session.post(f"{self.base_url}/admin/login", json={"username": "admin", "password": "admin123"}).json()
+            with requests.get(f"{self.base_url}/admin/events", params={"token": pair["access_token"]}, stream=True, timeout=30) as stream:
+                lines = stream.iter_lines(decode_unicode=True)
+                next(lines)  # retry hint
+                started = time.time()
+                self.session.post(f"{self.base_url}/auth/logout", json={"refresh_token": pair["refresh_token"]},
+                                  headers={"Authorization": f"Bearer {pair['access_token']}"})
+                for line in lines:
+                    pass
+                elapsed = time.time() - started
+            reconnect = self.session.get(f"{self.base_url}/admin/events", params={"token": pair["access_token"]}, timeout=10)
+            if reconnect.status_code == 401:
+                self.log_test("Admin Events Revocation", True, f"Stream closed {elapsed:.1f}s after logout and reconnect rejected")
+                tests_passed += 1
+            else:
+                self.log_test("Admin Events Revocation", False, f"Reconnect with revoked token got HTTP {reconnect.status_code}")
+        except Exception as e:
+            self.log_test("Admin Events Revocation", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_quote_pricing_concurrency(self):
+        """Test item pricing by product id with version compare-and-set"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.admin_token:
+            self.log_test("Quote Pricing Concurrency Setup", False, "No admin token available for pricing testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        try:
+            quote = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 1}).json()[0]
+        except Exception as e:
+            self.log_test("Quote Pricing Concurrency Setup", False, f"Error: {str(e)}")
+            return False
+        version = quote.get("version", 0)
+        
+        # Test 1: Pricing by product id recomputes the total server-side
+        total_tests += 1
+        try:
+            item = quote["items"][0]
+            pricing_data = {"item_prices": {item["product_id"]: 99.5}, "admin_notes": "Repriced", "version": version}
+            response = self.session.put(f"{self.base_url}/admin/quotes/{quote['id']}/pricing", json=pricing_data, headers=headers)
+            if response.status_code == 200:
+                data = response.json()
+                expected_total = round(sum((99.5 if line["product_id"] == item["product_id"] else line["price"]) * line["quantity"]
+                                           for line in quote["items"]), 2)
+                if data["version"] == version + 1 and abs(data["total_amount"] - expected_total) < 0.01:
+                    self.log_test("Quote Item Pricing", True, f"Total recomputed to ${data['total_amount']} at version {data['version']}")
+                    tests_passed += 1
+                else:
+                    self.log_test("Quote Item Pricing", False, f"Expected total {expected_total}", data)
+            else:
+                self.log_test("Quote Item Pricing", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Quote Item Pricing", False, f"Error: {str(e)}")
+        
+        # Test 2: A stale version is rejected instead of overwriting
+        total_tests += 1
+        try:
+            pricing_data = {"item_prices": {quote["items"][0]["product_id"]: 1.0}, "version": version}
+            response = self.session.put(f"{self.base_url}/admin/quotes/{quote['id']}/pricing", json=pricing_data, headers=headers)
+            if response.status_code == 409:
+                self.log_test("Quote Pricing Conflict", True, "Stale version rejected with 409")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Pricing Conflict", False, f"Expected 409, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Quote Pricing Conflict", False, f"Error: {str(e)}")
+        
+        # Test 3: Notes starting with "$" are stored as text, not read as a field path
+        total_tests += 1
+        try:
+            note = "$500 off for volume"
+            response = self.session.put(f"{self.base_url}/admin/quotes/{quote['id']}/pricing",
+                                        json={"item_prices": {}, "admin_notes": note}, headers=headers)
+            quotes = self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 500}).json()
+            stored = next((q.get("admin_notes") for q in quotes if q["id"] == quote["id"]), None)
+            if response.status_code == 200 and stored == note:
+                self.log_test("Quote Pricing Literal Notes", True, f"Stored note {stored!r}")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Pricing Literal Notes", False, f"HTTP {response.status_code}, stored {stored!r}")
+        except Exception as e:
+            self.log_test("Quote Pricing Literal Notes", False, f"Error: {str(e)}")
+        
+        # Test 4: A client total that disagrees with the item prices is rejected
+        total_tests += 1
+        try:
+            current = next(q for q in self.session.get(f"{self.base_url}/admin/quotes", headers=headers, params={"limit": 500}).json()
+                           if q["id"] == quote["id"])
+            pricing_data = {"item_prices": {}, "total_amount": current["total_amount"] + 100}
+            response = self.session.put(f"{self.base_url}/admin/quotes/{quote['id']}/pricing", json=pricing_data, headers=headers)
+            if response.status_code == 400:
+                self.log_test("Quote Pricing Total Mismatch", True, "Mismatched total_amount rejected with 400")
+                tests_passed += 1
+            else:
+                self.log_test("Quote Pricing Total Mismatch", False, f"Expected 400, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Quote Pricing Total Mismatch", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def test_admin_exports(self):
+        """Test streaming CSV/NDJSON exports with filters and gzip"""
+        tests_passed = 0
+        total_tests = 0
+        
+        if not self.admin_token:
+            self.log_test("Admin Exports Setup", False, "No admin token available for export testing")
+            return False
+        
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        
+        # Test 1: CSV export starts with the header row and never includes passwords
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/export/users", params={"format": "csv"}, headers=headers)
+            if response.status_code == 200:
+                header = response.text.splitlines()[0].split(",")
+                if header[0] == "id" and "email" in header and not any("password" in column for column in header):
+                    self.log_test("Export Users CSV", True, f"{len(response.text.splitlines()) - 1} rows exported")
+                    tests_passed += 1
+                else:
+                    self.log_test("Export Users CSV", False, "Unexpected header row", header)
+            else:
+                self.log_test("Export Users CSV", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Export Users CSV", False, f"Error: {str(e)}")
+        
+        # Test 2: NDJSON export applies the status filter server-side
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/export/quotes", params={"format": "ndjson", "status": "pending"}, headers=headers)
+            if response.status_code == 200:
+                rows = [json.loads(line) for line in response.text.splitlines()]
+                if all(row["status"] == "pending" for row in rows):
+                    self.log_test("Export Quotes NDJSON", True, f"{len(rows)} pending quotes exported")
+                    tests_passed += 1
+                else:
+                    self.log_test("Export Quotes NDJSON", False, "Filter not applied")
+            else:
+                self.log_test("Export Quotes NDJSON", False, f"HTTP {response.status_code}", response.text)
+        except Exception as e:
+            self.log_test("Export Quotes NDJSON", False, f"Error: {str(e)}")
+        
+        # Test 3: Gzipped export decompresses to the same CSV
+        total_tests += 1
+        try:
+            import gzip
+            response = requests.get(f"{self.base_url}/admin/export/dealers", params={"gzip": "true"}, headers=headers, stream=True)
+            if response.status_code == 200 and response.headers.get("content-type") == "application/gzip":
+                text = gzip.decompress(response.raw.read()).decode()
+                if text.startswith("id,"):
+                    self.log_test("Export Gzip", True, f"{len(text.splitlines()) - 1} dealer rows decompressed")
+                    tests_passed += 1
+                else:
+                    self.log_test("Export Gzip", False, "Unexpected decompressed content", text[:200])
+            else:
+                self.log_test("Export Gzip", False, f"HTTP {response.status_code}", response.headers.get("content-type"))
+        except Exception as e:
+            self.log_test("Export Gzip", False, f"Error: {str(e)}")
+        
+        # Test 4: Filters that don't apply to the dataset are rejected
+        total_tests += 1
+        try:
+            response = self.session.get(f"{self.base_url}/admin/export/users", params={"sender_type": "user"}, headers=headers)
+            if response.status_code == 400:
+                self.log_test("Export Filter Validation", True, "Unsupported filter rejected with 400")
+                tests_passed += 1
+            else:
+                self.log_test("Export Filter Validation", False, f"Expected 400, got {response.status_code}")
+        except Exception as e:
+            self.log_test("Export Filter Validation", False, f"Error: {str(e)}")
+        
+        # Test 5: Cells that would run as spreadsheet formulas are quoted with a leading '
+        total_tests += 1
+        try:
+            import csv
+            import io
+            formula = '=HYPERLINK("http://example.com","Click")'
+            email = f"formula-{uuid.uuid4().hex[:8]}@example.com"
+            self.session.post(f"{self.base_url}/users/register", json={
+                "email": email, "password": "FormulaTest123!", "first_name": "Formula", "last_name": "User",
+                "company_name": formula
+            })
+            response = self.session.get(f"{self.base_url}/admin/export/users", params={"format": "csv"}, headers=headers)
+            row = next((row for row in csv.DictReader(io.StringIO(response.text)) if row["email"] == email), None)
+            if row and row["company_name"] == "'" + formula:
+                self.log_test("Export Formula Escaping", True, f"Exported as {row['company_name']!r}")
+                tests_passed += 1
+            else:
+                self.log_test("Export Formula Escaping", False, f"Unexpected row for {email}", row)
+        except Exception as e:
+            self.log_test("Export Formula Escaping", False, f"Error: {str(e)}")
+        
+        return tests_passed == total_tests
+    
+    def run_all_tests(self):
+        """Run comprehensive B2B tactical gear backend tests"""
+        print("🚀 Starting Comprehensive B2B Tactical Gear Backend API Tests")
+        print("=" * 80)
+        
+        # Test 1: Health check
+        health_ok = self.test_health_check()
+        
+        if not health_ok:
+            print("\n❌ API is not responding. Stopping tests.")
+            return False
+        
+        # Test 2: Initialize sample data
+        init_ok = self.test_initialize_data()
+        
+        if not init_ok:
+            print("\n❌ Data initialization failed. Stopping tests.")
+            return False
+        
+        # Test 3: Create sample users
+        sample_users_ok = self.test_create_sample_users()
+        
+        if not sample_users_ok:
+            print("\n❌ Sample users creation failed. Stopping tests.")
+            return False
+        
+        # Wait a moment for data to be fully initialized
+        time.sleep(3)
+        
+        print("\n🔍 Testing Core Product Features...")
+        print("-" * 50)
+        
+        # Test core product functionality
+        categories_ok = self.test_get_categories()
+        brands_ok = self.test_get_brands()
+        products_ok = self.test_get_products()
+        filtering_ok = self.test_product_filtering()
+        specialized_ok = self.test_specialized_endpoints()
+        individual_ok = self.test_individual_product()
+        enhanced_products_ok = self.test_enhanced_product_apis()
+        
+        print("\n👤 Testing User Authentication System...")
+        print("-" * 50)
+        
+        # Test user authentication
+        user_auth_ok = self.test_user_authentication_system()
+        token_refresh_ok = self.test_token_refresh()
+        
+        # Test product reviews (requires a user token)
+        reviews_ok = self.test_product_reviews()
+        
+        print("\n🏢 Testing Dealer Authentication System...")
+        print("-" * 50)
+        
+        # Test dealer authentication
+        dealer_auth_ok = self.test_dealer_authentication_verification()
+        dealer_pricing_ok = self.test_dealer_pricing()
+        dealer_api_keys_ok = self.test_dealer_api_keys()
+        
+        print("\n🛒 Testing Enhanced Cart System...")
+        print("-" * 50)
+        
+        # Test user-based cart system
+        cart_ok = self.test_enhanced_cart_system()
+        bulk_cart_ok = self.test_bulk_cart_operations()
+        guest_cart_ok = self.test_guest_cart()
+        
+        print("\n💼 Testing Quote System...")
+        print("-" * 50)
+        
+        # Test quote system
+        quote_ok = self.test_quote_system()
+        quote_history_ok = self.test_user_quote_history()
+        quote_snapshots_ok = self.test_quote_item_snapshots()
+        quote_pdf_ok = self.test_quote_pdf()
+        
+        print("\n💼 Testing Enhanced Quote System...")
+        print("-" * 50)
+        
+        # Test enhanced quote system with comprehensive data model
+        enhanced_quote_ok = self.test_enhanced_quote_system()
+        
+        print("\n💬 Testing Chat System...")
+        print("-" * 50)
+        
+        # Test chat system
+        chat_ok = self.test_chat_system()
+        
+        print("\n🔧 Testing Enhanced Filtering...")
+        print("-" * 50)
+        
+        # Test enhanced filtering
+        enhanced_filtering_ok = self.test_enhanced_filtering()
+        
+        print("\n🔑 Testing Admin Panel System...")
+        print("-" * 50)
+        
+        # Test admin authentication and management
+        admin_auth_ok = self.test_admin_authentication_system()
+        admin_management_ok = self.test_admin_management_endpoints()
+        admin_dealer_mgmt_ok = self.test_admin_dealer_management()
+        admin_quote_mgmt_ok = self.test_admin_quote_management()
+        admin_quote_pagination_ok = self.test_admin_quote_pagination()
+        quote_analytics_ok = self.test_quote_analytics()
+        quote_search_ok = self.test_admin_quote_search()
+        admin_events_ok = self.test_admin_event_stream()
+        pricing_concurrency_ok = self.test_quote_pricing_concurrency()
+        admin_exports_ok = self.test_admin_exports()
+        cart_compaction_ok = self.test_cart_compaction()
+        quote_cart_clearing_ok = self.test_quote_cart_clearing()
+        admin_authorization_ok = self.test_admin_authorization()
+        
+        print("\n💰 Testing Enhanced Quote Pricing System...")
+        print("-" * 50)
+        
+        # Test enhanced quote-based pricing system with email and pricing endpoints
+        enhanced_quote_pricing_ok = self.test_enhanced_quote_pricing_system()
+        
+        print("\n💬 Testing Admin Chat System...")
+        print("-" * 50)
+        
+        # Test admin chat system functionality
+        admin_chat_ok = self.test_admin_chat_system()
+        
+        print("\n🚦 Testing Login Rate Limiting...")
+        print("-" * 50)
+        
+        # Runs last so draining the IP bucket can't lock out the logins above
+        login_rate_limit_ok = self.test_login_rate_limit()
         
         # Summary
         print("\n" + "=" * 80)
@@ -2694,9 +3909,9 @@ class TacticalGearAPITester:
         # Group tests by category
         core_tests = [health_ok, init_ok, sample_users_ok]
         product_tests = [categories_ok, brands_ok, products_ok, filtering_ok, specialized_ok, individual_ok, enhanced_products_ok]
-        auth_tests = [user_auth_ok, dealer_auth_ok]
-        b2b_tests = [cart_ok, quote_ok, enhanced_quote_ok, chat_ok, enhanced_filtering_ok]
-        admin_tests = [admin_auth_ok, admin_management_ok, admin_dealer_mgmt_ok, admin_quote_mgmt_ok, admin_authorization_ok, enhanced_quote_pricing_ok, admin_chat_ok]
+        auth_tests = [user_auth_ok, token_refresh_ok, login_rate_limit_ok, dealer_auth_ok, dealer_pricing_ok, dealer_api_keys_ok]
+        b2b_tests = [cart_ok, bulk_cart_ok, guest_cart_ok, quote_ok, quote_history_ok, quote_snapshots_ok, quote_pdf_ok, enhanced_quote_ok, chat_ok, enhanced_filtering_ok, reviews_ok]
+        admin_tests = [admin_auth_ok, admin_management_ok, admin_dealer_mgmt_ok, admin_quote_mgmt_ok, admin_quote_pagination_ok, quote_analytics_ok, quote_search_ok, admin_events_ok, pricing_concurrency_ok, admin_exports_ok, cart_compaction_ok, quote_cart_clearing_ok, admin_authorization_ok, enhanced_quote_pricing_ok, admin_chat_ok]
         
         all_tests = core_tests + product_tests + auth_tests + b2b_tests + admin_tests
         passed_tests = sum(all_tests)
@@ -2715,19 +3930,19 @@ class TacticalGearAPITester:
             print(f"  {status} {name}")
         
         print("\n🔐 Authentication Systems:")
-        auth_names = ["User Authentication", "Dealer Authentication"]
+        auth_names = ["User Authentication", "Token Refresh", "Login Rate Limit", "Dealer Authentication", "Dealer Pricing", "Dealer API Keys"]
         for name, result in zip(auth_names, auth_tests):
             status = "✅" if result else "❌"
             print(f"  {status} {name}")
         
         print("\n🏢 B2B Features:")
-        b2b_names = ["Enhanced Cart System", "Quote System", "Enhanced Quote System", "Chat System", "Enhanced Filtering"]
+        b2b_names = ["Enhanced Cart System", "Bulk Cart Operations", "Guest Cart", "Quote System", "Quote History", "Quote Item Snapshots", "Quote PDF", "Enhanced Quote System", "Chat System", "Enhanced Filtering", "Product Reviews"]
         for name, result in zip(b2b_names, b2b_tests):
             status = "✅" if result else "❌"
             print(f"  {status} {name}")
         
         print("\n🔑 Admin Panel:")
-        admin_names = ["Admin Authentication", "Admin Management", "Dealer Management", "Quote Management", "Admin Authorization", "Enhanced Quote Pricing", "Admin Chat System"]
+        admin_names = ["Admin Authentication", "Admin Management", "Dealer Management", "Quote Management", "Quote Pagination", "Quote Analytics", "Quote Search", "Admin Events", "Quote Pricing Concurrency", "Admin Exports", "Cart Compaction", "Quote Cart Clearing", "Admin Authorization", "Enhanced Quote Pricing", "Admin Chat System"]
         for name, result in zip(admin_names, admin_tests):
             status = "✅" if result else "❌"
             print(f"  {status} {name}")
@@ -8,6 +8,66 @@ import axios from "axios";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL || 'http://127.0.0.1:8000';
 const API = `${BACKEND_URL}/api`;
 
+// Access tokens are short-lived: on a 401, swap the matching refresh token
+// for a new pair and retry the request once. Refresh tokens rotate on use, so
+// requests that fail together share one in-flight refresh per token key.
+const TOKEN_KEYS = ['user_token', 'dealer_token', 'admin_token'];
+const refreshesInFlight = {};
+const rotatedTokens = {};
+
+const refreshSession = (tokenKey) => {
+  if (!refreshesInFlight[tokenKey]) {
+    const refreshToken = localStorage.getItem(`${tokenKey}_refresh`);
+    if (!refreshToken) {
+      return Promise.reject(new Error('No refresh token'));
+    }
+    refreshesInFlight[tokenKey] = axios.post(`${API}/auth/refresh`, { refresh_token: refreshToken })
+      .then(({ data }) => {
+        rotatedTokens[tokenKey] = localStorage.getItem(tokenKey);
+        localStorage.setItem(tokenKey, data.access_token);
+        localStorage.setItem(`${tokenKey}_refresh`, data.refresh_token);
+        return data.access_token;
+      })
+      .catch((refreshError) => {
+        localStorage.removeItem(`${tokenKey}_refresh`);
+        throw refreshError;
+      })
+      .finally(() => {
+        delete refreshesInFlight[tokenKey];
+      });
+  }
+  return refreshesInFlight[tokenKey];
+};
+
+axios.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const authHeader = original?.headers?.Authorization;
+    if (error.response?.status !== 401 || !authHeader || original._retried) {
+      return Promise.reject(error);
+    }
+    // A request sent just before a refresh finished carries the token it replaced
+    const token = authHeader.replace(/^Bearer /, '');
+    const tokenKey = TOKEN_KEYS.find((key) => localStorage.getItem(key) === token || rotatedTokens[key] === token);
+    if (!tokenKey) {
+      return Promise.reject(error);
+    }
+    const current = localStorage.getItem(tokenKey);
+    if (!current) {
+      return Promise.reject(error);
+    }
+    try {
+      const accessToken = current !== token ? current : await refreshSession(tokenKey);
+      original._retried = true;
+      original.headers.Authorization = `Bearer ${accessToken}`;
+      return axios(original);
+    } catch (refreshError) {
+      return Promise.reject(error);
+    }
+  }
+);
+
 // Context for Authentication and Cart
 const AppContext = createContext();
 
@@ -129,8 +189,9 @@ const AppProvider = ({ children }) => {
   const loginDealer = async (email, password) => {
     try {
       const response = await axios.post(`${API}/dealers/login`, { email, password });
-      const { access_token, dealer: dealerData } = response.data;
+      const { access_token, refresh_token, dealer: dealerData } = response.data;
       localStorage.setItem('dealer_token', access_token);
+      localStorage.setItem('dealer_token_refresh', refresh_token);
       setDealer(dealerData);
       return { success: true, dealer: dealerData };
     } catch (error) {
@@ -141,8 +202,9 @@ const AppProvider = ({ children }) => {
   const loginUser = async (email, password) => {
     try {
       const response = await axios.post(`${API}/users/login`, { email, password });
-      const { access_token, user: userData } = response.data;
+      const { access_token, refresh_token, user: userData } = response.data;
       localStorage.setItem('user_token', access_token);
+      localStorage.setItem('user_token_refresh', refresh_token);
       setUser(userData);
       fetchCart(); // Load cart after user login
       return { success: true, user: userData };
@@ -172,8 +234,9 @@ const AppProvider = ({ children }) => {
   const loginAdmin = async (username, password) => {
     try {
       const response = await axios.post(`${API}/admin/login`, { username, password });
-      const { access_token, admin: adminData } = response.data;
+      const { access_token, refresh_token, admin: adminData } = response.data;
       localStorage.setItem('admin_token', access_token);
+      localStorage.setItem('admin_token_refresh', refresh_token);
       setAdmin(adminData);
       return { success: true, admin: adminData };
     } catch (error) {
@@ -182,9 +245,14 @@ const AppProvider = ({ children }) => {
   };
 
   const logout = () => {
-    localStorage.removeItem('dealer_token');
-    localStorage.removeItem('user_token');
-    localStorage.removeItem('admin_token');
+    TOKEN_KEYS.forEach((key) => {
+      const refreshToken = localStorage.getItem(`${key}_refresh`);
+      if (refreshToken) {
+        axios.post(`${API}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+      }
+      localStorage.removeItem(key);
+      localStorage.removeItem(`${key}_refresh`);
+    });
     setDealer(null);
     setUser(null);
     setAdmin(null);
@@ -2437,6 +2505,7 @@ const QuoteCheckout = () => {
 const UserProfile = () => {
   const { user, logout } = useApp();
   const [quotes, setQuotes] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
@@ -2448,13 +2517,15 @@ const UserProfile = () => {
     fetchQuotes();
   }, [user, navigate]);
 
-  const fetchQuotes = async () => {
+  const fetchQuotes = async (cursor = null) => {
     try {
       const userToken = localStorage.getItem("user_token");
       const response = await axios.get(`${API}/quotes`, {
         headers: { Authorization: `Bearer ${userToken}` },
+        params: cursor ? { cursor } : {},
       });
-      setQuotes(response.data);
+      setQuotes((prev) => (cursor ? [...prev, ...response.data] : response.data));
+      setNextCursor(response.headers["x-next-cursor"] || null);
     } catch (error) {
       console.error("Error fetching quotes:", error);
     } finally {
@@ -2622,9 +2693,9 @@ const UserProfile = () => {
                         </p>
                         <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-3">
                           {quote.items.map((item, idx) => {
-                            // Using notes as product label
+                            // Snapshot name, falling back to notes on older quotes
                             const productLabel =
-                              item.notes || "No Product Name";
+                              item.name || item.notes || "No Product Name";
 
                             return (
                               <div
@@ -2685,6 +2756,14 @@ const UserProfile = () => {
                       )}
                     </div>
                   ))}
+                  {nextCursor && (
+                    <button
+                      onClick={() => fetchQuotes(nextCursor)}
+                      className="w-full bg-gray-200 text-gray-800 py-2 px-4 rounded-lg hover:bg-gray-300"
+                    >
+                      Load More Quotes
+                    </button>
+                  )}
                 </div>
               )}
             </div>
@@ -2793,11 +2872,15 @@ const AdminLogin = () => {
 };
 
 // Admin Dashboard
+// The admin quote listing is keyset-paged; older pages load on demand
+const ADMIN_QUOTE_PAGE_SIZE = 20;
+
 const AdminDashboard = () => {
   const { admin, logout } = useApp();
   const [stats, setStats] = useState({});
   const [pendingDealers, setPendingDealers] = useState([]);
   const [allQuotes, setAllQuotes] = useState([]);
+  const [quotesCursor, setQuotesCursor] = useState(null);
   const [conversations, setConversations] = useState([]);
   const [selectedConversation, setSelectedConversation] = useState(null);
   const [chatMessages, setChatMessages] = useState([]);
@@ -2817,6 +2900,51 @@ const AdminDashboard = () => {
     }
   }, [admin, navigate, activeTab]);
 
+  // Refresh from the live admin event stream instead of polling
+  useEffect(() => {
+    if (!admin) return;
+    let events;
+    let reconnectTimer;
+    let stopped = false;
+    const refreshDashboard = () => fetchDashboardData();
+
+    const connect = () => {
+      const adminToken = localStorage.getItem('admin_token');
+      events = new EventSource(`${API}/admin/events?token=${encodeURIComponent(adminToken)}`);
+      ['quote.created', 'quote.status_changed', 'dealer.registered', 'dealer.status_changed'].forEach((type) =>
+        events.addEventListener(type, refreshDashboard)
+      );
+      events.addEventListener('chat.message', (event) => {
+        if (activeTab !== 'chat') return;
+        fetchConversations();
+        const message = JSON.parse(event.data);
+        if (selectedConversation?.user_id === message.user_id) {
+          fetchChatMessages(message.user_id);
+        }
+      });
+      // The server ends the stream when the token expires; EventSource retries with
+      // the same URL, and once that is rejected it gives up. Reopen with a fresh token.
+      events.onerror = () => {
+        if (stopped || events.readyState !== EventSource.CLOSED) return;
+        const renewed = localStorage.getItem('admin_token') !== adminToken
+          ? Promise.resolve()
+          : refreshSession('admin_token');
+        renewed
+          .then(() => {
+            if (!stopped) reconnectTimer = setTimeout(connect, 1000);
+          })
+          .catch((error) => console.error('Admin event stream closed:', error));
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(reconnectTimer);
+      events.close();
+    };
+  }, [admin, activeTab, selectedConversation]);
+
   const fetchDashboardData = async () => {
     try {
       const adminToken = localStorage.getItem('admin_token');
@@ -2825,12 +2953,13 @@ const AdminDashboard = () => {
       const [statsRes, dealersRes, quotesRes] = await Promise.all([
         axios.get(`${API}/admin/stats`, { headers }),
         axios.get(`${API}/admin/dealers/pending`, { headers }),
-        axios.get(`${API}/admin/quotes`, { headers })
+        axios.get(`${API}/admin/quotes`, { headers, params: { limit: ADMIN_QUOTE_PAGE_SIZE } })
       ]);
 
       setStats(statsRes.data);
       setPendingDealers(dealersRes.data);
       setAllQuotes(quotesRes.data);
+      setQuotesCursor(quotesRes.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error fetching dashboard data:', error);
     } finally {
@@ -2838,6 +2967,21 @@ const AdminDashboard = () => {
     }
   };
 
+  const fetchMoreQuotes = async () => {
+    try {
+      const adminToken = localStorage.getItem('admin_token');
+      const headers = { Authorization: `Bearer ${adminToken}` };
+      const response = await axios.get(`${API}/admin/quotes`, {
+        headers,
+        params: { limit: ADMIN_QUOTE_PAGE_SIZE, cursor: quotesCursor }
+      });
+      setAllQuotes((prev) => [...prev, ...response.data]);
+      setQuotesCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error fetching quotes:', error);
+    }
+  };
+
   const fetchConversations = async () => {
     try {
       const adminToken = localStorage.getItem('admin_token');
@@ -3062,7 +3206,7 @@ const AdminDashboard = () => {
              <p className="text-gray-500 text-center">No quote requests</p>
              ) : (
             <div className="space-y-5 max-h-[520px] overflow-y-auto">
-        {allQuotes.slice(0, 5).map((quote) => (
+        {allQuotes.map((quote) => (
           <div
             key={quote.id}
             className="border rounded-lg p-4 flex flex-col shadow-sm hover:shadow-md transition-shadow duration-200"
@@ -3139,9 +3283,12 @@ const AdminDashboard = () => {
             <div className="mt-2 border rounded-md p-2 bg-gray-50 shadow-inner overflow-y-auto h-20 scrollbar-thin scrollbar-thumb-gray-400 scrollbar-track-gray-200">
               <h4 className="text-sm font-semibold mb-2">Requested Items</h4>
               {quote.items.map((item, idx) => {
-                const [productName, brandName] = item.notes.includes(" - ")
-                  ? item.notes.split(" - ")
-                  : [item.notes, ""];
+                const notes = item.notes || "";
+                const [productName, brandName] = item.name
+                  ? [item.name, item.brand]
+                  : notes.includes(" - ")
+                  ? notes.split(" - ")
+                  : [notes, ""];
                 const price = item.price != null ? Number(item.price).toFixed(2) : "—";
 
                 return (
@@ -3160,6 +3307,14 @@ const AdminDashboard = () => {
             </div>
           </div>
         ))}
+        {quotesCursor && (
+          <button
+            onClick={fetchMoreQuotes}
+            className="w-full bg-gray-200 text-gray-800 py-2 px-4 rounded-lg hover:bg-gray-300"
+          >
+            Load More Quotes
+          </button>
+        )}
       </div>
     )}
   </div>
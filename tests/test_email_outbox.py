@@ -0,0 +1,160 @@
+"""EmailOutbox delivery, retry/backoff and dead-lettering against an SMTP stand-in.
+
+Drives the real outbox code in backend/server.py with ``smtplib.SMTP`` patched
+out. Needs a reachable MongoDB (MONGO_URL, default localhost); the tests are
+skipped otherwise.
+
+    python -m pytest tests/test_email_outbox.py
+"""
+
+import asyncio
+import os
+import smtplib
+import sys
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_email_outbox")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP: records sent messages, raises queued failures first"""
+
+    sent = []
+    failures = []
+    connections = 0
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.connections += 1
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def send_message(self, message):
+        if FakeSMTP.failures:
+            raise FakeSMTP.failures.pop(0)
+        FakeSMTP.sent.append(message)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class EmailOutboxTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"], serverSelectionTimeoutMS=2000)
+        try:
+            await client.admin.command("ping")
+        except Exception as error:
+            client.close()
+            self.skipTest(f"MongoDB not reachable: {error}")
+        self.client = client
+        self.db = client[f"{os.environ['DB_NAME']}_{uuid.uuid4().hex[:8]}"]
+        FakeSMTP.sent, FakeSMTP.failures, FakeSMTP.connections = [], [], 0
+        for patcher in (
+            mock.patch.object(server, "db", self.db),
+            mock.patch.object(server, "SMTP_HOST", "smtp.test"),
+            mock.patch.object(server, "SMTP_STARTTLS", False),
+            mock.patch.object(server, "EMAIL_MAX_ATTEMPTS", 3),
+            mock.patch.object(server, "EMAIL_RETRY_BASE_SECONDS", 30.0),
+            mock.patch.object(server, "EMAIL_POLL_SECONDS", 0.1),
+            mock.patch("smtplib.SMTP", FakeSMTP),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.outbox = server.EmailOutbox()
+
+    async def asyncTearDown(self):
+        if hasattr(self, "client"):
+            await self.outbox.stop()
+            await self.client.drop_database(self.db.name)
+            self.client.close()
+
+    async def enqueue(self) -> str:
+        # A fresh recipient per message keeps the per-recipient limiter out of the way
+        return await self.outbox.enqueue(f"buyer-{uuid.uuid4().hex[:8]}@example.com", "Your quote", "Quote body")
+
+    async def attempt(self, email_id: str) -> dict:
+        """Make the message due, claim it and run one delivery attempt"""
+        await self.db.email_outbox.update_one({"id": email_id}, {"$set": {"next_attempt_at": datetime.now(timezone.utc)}})
+        batch = await self.outbox._claim_batch()
+        self.assertEqual([message["id"] for message in batch], [email_id])
+        await self.outbox._deliver(batch[0], None)
+        return await self.db.email_outbox.find_one({"id": email_id}, {"_id": 0})
+
+    async def test_workers_deliver_queued_email(self):
+        await self.outbox.start()
+        email_id = await self.enqueue()
+        for _ in range(50):
+            message = await self.db.email_outbox.find_one({"id": email_id})
+            if message["status"] == "sent":
+                break
+            await asyncio.sleep(0.1)
+        self.assertEqual(message["status"], "sent")
+        self.assertEqual(message["attempts"], 1)
+        self.assertEqual([sent["Subject"] for sent in FakeSMTP.sent], ["Your quote"])
+        self.assertEqual(self.outbox.stats()["sent"], 1)
+
+    async def test_transient_failure_is_retried_with_backoff(self):
+        email_id = await self.enqueue()
+        FakeSMTP.failures = [smtplib.SMTPServerDisconnected("connection dropped")]
+
+        before = datetime.now(timezone.utc)
+        message = await self.attempt(email_id)
+        self.assertEqual(message["status"], "pending")
+        self.assertEqual(message["attempts"], 1)
+        self.assertIn("connection dropped", message["last_error"])
+        next_attempt_at = message["next_attempt_at"].replace(tzinfo=timezone.utc)
+        self.assertGreaterEqual(next_attempt_at, before + timedelta(seconds=30))
+        self.assertEqual(await self.outbox._claim_batch(), [])  # not due until the backoff passes
+
+        FakeSMTP.failures = [smtplib.SMTPResponseException(421, b"try again later")]
+        message = await self.attempt(email_id)
+        next_attempt_at = message["next_attempt_at"].replace(tzinfo=timezone.utc)
+        self.assertGreaterEqual(next_attempt_at, before + timedelta(seconds=60))  # backoff doubles
+
+        message = await self.attempt(email_id)
+        self.assertEqual(message["status"], "sent")
+        self.assertEqual(message["attempts"], 3)
+        self.assertEqual(len(FakeSMTP.sent), 1)
+        self.assertEqual(self.outbox.retried, 2)
+
+    async def test_dead_letter_after_max_attempts(self):
+        email_id = await self.enqueue()
+        FakeSMTP.failures = [smtplib.SMTPServerDisconnected("down")] * 3
+
+        for _ in range(2):
+            message = await self.attempt(email_id)
+            self.assertEqual(message["status"], "pending")
+        message = await self.attempt(email_id)
+        self.assertEqual(message["status"], "failed")
+        self.assertEqual(message["attempts"], 3)
+        self.assertNotIn("claim_id", message)
+        self.assertEqual(await self.outbox._claim_batch(), [])
+        self.assertEqual(self.outbox.failed, 1)
+
+    async def test_permanent_failure_is_not_retried(self):
+        email_id = await self.enqueue()
+        FakeSMTP.failures = [smtplib.SMTPResponseException(550, b"mailbox unavailable")]
+
+        message = await self.attempt(email_id)
+        self.assertEqual(message["status"], "failed")
+        self.assertEqual(message["attempts"], 1)
+        self.assertEqual(FakeSMTP.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()